@@ -0,0 +1,287 @@
+"""Offline /play benchmark: time to first audio, mapping throughput and peak memory.
+
+Drives ``Music.play`` end to end with yt-dlp, Spotify, ffmpeg and the voice
+client replaced by the stubs in ``stubs.py``, for a single video, YouTube
+playlists and Spotify playlists of 10/100/1000 tracks. The database is left
+unreachable, so every run is a cold cache run. Latencies are fixed per call
+type, so numbers only move when the pipeline does.
+
+The extractor answers are synthetic: no recorded fixture ships with the repo,
+so every video is built from the template in ``stubs.py``. Recording one with
+``record`` (written to fixtures/video.json) swaps in a real yt-dlp answer for
+the template; latencies stay the fixed stub ones either way.
+
+ttfa is the time from the command to the first audio frame; fill is the time
+between the first and the last track entering the queue, and tracks/s the
+mapping throughput over it. The transition rows give the gap between the end
+of a track and the first frame of the next, with and without pre-roll. The
+contended row is the time to first audio of a single video played in a second
+guild while the first one imports a Spotify playlist.
+
+Run from the repository root:
+    python benchmarks/music_pipeline.py [--scale 0.2] [--sizes 10,100] [--json out.json]
+    python benchmarks/music_pipeline.py record <youtube url>   # refresh fixtures/video.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stubs  # noqa: E402
+
+SIZES = (10, 100, 1000)
+
+
+def load_cog_module(mode: str, scale: float):
+    """Import the music cog with the settings and database it expects, but offline."""
+    os.environ.setdefault('DOURADINHOS', '0')
+    os.environ.setdefault('SPOTIFY_CLIENT_ID', 'bench')
+    os.environ.setdefault('SPOTIFY_CLIENT_SECRET', 'bench')
+    # settings writes logs/ and the audio cache relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='dourabot-bench-'))
+    os.makedirs('logs', exist_ok=True)
+
+    import settings
+    settings.MUSIC_EXTRACTION_MODE = mode
+    # Latencies are scaled, so the YouTube request budget is too
+    settings.MUSIC_YOUTUBE_RATE /= scale
+
+    import database
+
+    def no_pool(self, *args, **kwargs):
+        pass
+
+    def no_connection(self):
+        raise ValueError('benchmark runs without a database')
+
+    database.DatabaseManager.create_pool = no_pool
+    database.DatabaseManager.get_connection = no_connection
+
+    import discord
+    discord.FFmpegOpusAudio = stubs.FakeAudioSource
+    discord.FFmpegPCMAudio = stubs.FakeAudioSource
+
+    import cogs.music
+    return cogs.music
+
+
+def scenarios(sizes):
+    yield 'single video', 'https://www.youtube.com/watch?v=benchvideo1'
+    for n in sizes:
+        yield f'youtube playlist {n}', f'https://www.youtube.com/playlist?list=BENCH{n}'
+    for n in sizes:
+        yield f'spotify playlist {n}', f'https://open.spotify.com/playlist/bench{n}'
+
+
+class Session:
+    """One cog with a fake guild, user and channels, and the times audio started in it."""
+
+    def __init__(self, music):
+        loop = asyncio.get_running_loop()
+        self.audio: asyncio.Queue[float] = asyncio.Queue()
+
+        def on_audio():
+            loop.call_soon_threadsafe(self.audio.put_nowait, time.perf_counter())
+
+        self.text = stubs.FakeTextChannel()
+        self.itr = stubs.FakeInteraction(stubs.FakeUser(stubs.FakeVoiceChannel(on_audio)), self.text)
+        self.cog = music.Music(stubs.FakeClient(self.text))
+        self.player = self.cog.get_player(self.itr.guild)
+
+    async def play(self, url: str):
+        return await self.cog.play.callback(self.cog, self.itr, search=url)
+
+    async def close(self):
+        for player in self.cog.players.values():
+            player.cancel_tasks()
+            await player.controller.close()
+        self.cog.cog_unload()
+
+
+async def run_scenario(music, url: str) -> dict:
+    session = Session(music)
+    try:
+        await session.cog.cog_load()
+        player = session.player
+        # Timestamps of queue appends: mapping throughput is measured between the first and the last
+        appended = []
+        append = player.queue.append
+
+        def timed_append(song):
+            appended.append(time.perf_counter())
+            return append(song)
+
+        player.queue.append = timed_append
+        started = time.perf_counter()
+        command = asyncio.create_task(session.play(url))
+        ttfa = await asyncio.wait_for(session.audio.get(), 600) - started
+        # Let /play finish so its background fetches have been spawned
+        await command
+        while player.background_tasks:
+            await asyncio.gather(*player.background_tasks, return_exceptions=True)
+        total = time.perf_counter() - started
+        tracks = len(appended)
+        filled = appended[-1] - appended[0] if tracks > 1 else 0.0
+        return {'ttfa': ttfa, 'total': total, 'tracks': tracks, 'fill': filled,
+                'throughput': (tracks - 1) / filled if filled else 0.0,
+                'index_hit_rate': session.cog.track_index.stats()['hit_rate'],
+                'spans': {name: p['p50'] for name, p in session.cog.trace_stats.percentiles().get('play', {}).items()}}
+    finally:
+        await session.close()
+
+
+async def run_transitions(music, preroll: bool, count: int = 3) -> dict:
+    """Gap between the end of a track and the first frame of the next one."""
+    settings = music.settings
+    saved = settings.MUSIC_PREROLL_SECONDS
+    # Bench tracks never get near their end, so pre-roll right away (or never)
+    settings.MUSIC_PREROLL_SECONDS = 10 ** 6 if preroll else 0
+    session = Session(music)
+    try:
+        await session.play(f'https://www.youtube.com/playlist?list=BENCH{count + 1}')
+        await asyncio.wait_for(session.audio.get(), 600)
+        while session.player.background_tasks:
+            await asyncio.gather(*session.player.background_tasks, return_exceptions=True)
+        gaps = []
+        for _ in range(count):
+            if preroll:
+                while session.player.preroll is None or not session.player.preroll[1].buffered:
+                    await asyncio.sleep(0.005)
+            else:
+                await asyncio.sleep(0.2)  # let the prefetch resolve the next stream, as during a real track
+            ended = time.perf_counter()
+            session.player.voice_client.finish()
+            gaps.append(await asyncio.wait_for(session.audio.get(), 600) - ended)
+        gap = sum(gaps) / len(gaps)
+        return {'ttfa': gap, 'total': gap, 'tracks': count, 'fill': 0.0, 'throughput': 0.0, 'gaps': gaps}
+    finally:
+        settings.MUSIC_PREROLL_SECONDS = saved
+        await session.close()
+
+
+async def run_contended(music, size: int) -> dict:
+    """/play of one video in a guild while another guild's Spotify import keeps the extraction workers busy."""
+    session = Session(music)
+    loop = asyncio.get_running_loop()
+    audio: asyncio.Queue[float] = asyncio.Queue()
+
+    def on_audio():
+        loop.call_soon_threadsafe(audio.put_nowait, time.perf_counter())
+
+    other = stubs.FakeInteraction(stubs.FakeUser(stubs.FakeVoiceChannel(on_audio)), session.text, guild_id=2)
+    try:
+        await session.play(f'https://open.spotify.com/playlist/bench{size}')
+        await asyncio.wait_for(session.audio.get(), 600)
+        await asyncio.sleep(0.5)  # let the import fill the extraction queue
+        started = time.perf_counter()
+        command = asyncio.create_task(session.cog.play.callback(session.cog, other,
+                                                                search='https://www.youtube.com/watch?v=benchother'))
+        ttfa = await asyncio.wait_for(audio.get(), 600) - started
+        await command
+        return {'ttfa': ttfa, 'total': ttfa, 'tracks': 1, 'fill': 0.0, 'throughput': 0.0,
+                'scheduler': session.cog.extraction.scheduler.stats()}
+    finally:
+        await session.close()
+
+
+async def run_all(music, sizes, memory: bool) -> list[dict]:
+    results = []
+    for name, url in scenarios(sizes):
+        result = await run_scenario(music, url)
+        if memory:
+            # Second pass: tracemalloc slows allocation-heavy code, so it is kept out of the timings
+            tracemalloc.start()
+            await run_scenario(music, url)
+            result['peak_mib'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        result['name'] = name
+        results.append(result)
+        print(format_row(result), flush=True)
+    for name, preroll in (('transition (cold)', False), ('transition (preroll)', True)):
+        result = await run_transitions(music, preroll)
+        result['name'] = name
+        results.append(result)
+        print(format_row(result), flush=True)
+    result = await run_contended(music, max(sizes))
+    result['name'] = f'contended {max(sizes)}'
+    results.append(result)
+    print(format_row(result), flush=True)
+    return results
+
+
+def format_row(r: dict) -> str:
+    peak = f'{r["peak_mib"]:>9.2f}' if 'peak_mib' in r else f'{"-":>9}'
+    return (f'{r["name"]:<22}{r["ttfa"] * 1000:>10.0f}{r["fill"]:>10.2f}'
+            f'{r["tracks"]:>8}{r["throughput"]:>10.1f}{peak}')
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(url: str):
+    """Store a real extraction of ``url`` as the template the replay stub serves."""
+    from yt_dlp import YoutubeDL
+    with YoutubeDL({'format': 'bestaudio/best', 'quiet': True, 'noplaylist': True}) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    os.makedirs(stubs.FIXTURES, exist_ok=True)
+    path = os.path.join(stubs.FIXTURES, 'video.json')
+    with open(path, 'w') as f:
+        json.dump(info, f)
+    print(f'recorded {url} -> {path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', choices=('run', 'record'), default='run')
+    parser.add_argument('url', nargs='?', help='video to record (record only)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the stubbed call latencies')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='playlist sizes, comma separated')
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread', help='extraction mode')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        if not args.url:
+            parser.error('record needs a YouTube url')
+        record(args.url)
+        return
+
+    replay = stubs.Replay(scale=args.scale)
+    stubs.FakeAudioSource.startup = stubs.LATENCY['ffmpeg_start'] * args.scale
+    import logic.music.ytdl_pool
+    logic.music.ytdl_pool.YoutubeDL = stubs.make_youtube_dl(replay)
+    music = load_cog_module(args.mode, args.scale)
+    music.SpotifyClient = lambda *args, **kwargs: stubs.ReplaySpotify(replay)
+    music.measure_loudness = stubs.make_measure_loudness(replay)
+
+    sizes = [int(n) for n in args.sizes.split(',') if n]
+    if replay.template is stubs._TEMPLATE:
+        print('note: no fixtures/video.json, replaying the built-in template; '
+              'run "record <youtube url>" once with network access for a recorded one')
+    print(f'{"scenario":<22}{"ttfa ms":>10}{"fill s":>10}{"tracks":>8}{"tracks/s":>10}{"peak MiB":>9}')
+    results = asyncio.run(run_all(music, sizes, memory=not args.no_memory))
+
+    if args.json:
+        with open(os.path.join(ROOT, args.json) if not os.path.isabs(args.json) else args.json, 'w') as f:
+            json.dump({'commit': git_commit(), 'scale': args.scale, 'mode': args.mode,
+                       'template': 'recorded' if replay.template is not stubs._TEMPLATE else 'builtin',
+                       'calls': replay.calls, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Queue operations on a 10k-track playlist: TrackQueue vs the previous list + index queue.
+
+TrackQueue is ahead on advance only. Append, shuffle + unshuffle and skip_to
+cost it more than the list queue: every entry gets an id and an order key,
+unshuffle sorts instead of restoring a saved copy, and skip_to frees the
+skipped entries where the list queue only moved its index.
+
+Run from the repository root:  python benchmarks/queue_benchmark.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from logic.music.track_queue import TrackQueue  # noqa: E402
+
+TRACKS = 10_000
+PAGE_SIZE = 8
+
+
+class ListQueue:
+    """The list-based queue GuildPlayer used before TrackQueue."""
+
+    def __init__(self):
+        self._queue = []
+        self.queue_index = 0
+        self._original_queue = None
+
+    def append(self, song, channel=None):
+        self._queue.append({'song': song, 'channel': channel})
+
+    def advance(self):
+        self.queue_index += 1
+        if self.queue_index > 2:
+            self._queue.pop(self.queue_index - 3)
+            self.queue_index -= 1
+
+    def shuffle(self):
+        self._original_queue = self._queue.copy()
+        upcoming = self._queue[self.queue_index + 1:]
+        random.shuffle(upcoming)
+        self._queue[self.queue_index + 1:] = upcoming
+
+    def unshuffle(self):
+        self._queue[self.queue_index + 1:] = self._original_queue[self.queue_index + 1:]
+        self._original_queue = None
+
+    def page(self, page):
+        upcoming = self._queue[self.queue_index + 1:]
+        return upcoming[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+    def skip_to(self, index):
+        self.queue_index = index - 1
+
+
+def songs():
+    return [{'link': f'https://www.youtube.com/watch?v={i:011d}', 'title': f'Track {i}',
+             'original_url': f'https://www.youtube.com/watch?v={i:011d}', 'source': None, 'thumbnail': None}
+            for i in range(TRACKS)]
+
+
+def timed(label, results, fn):
+    start = time.perf_counter()
+    fn()
+    results[label] = time.perf_counter() - start
+
+
+def bench(queue, page, skip_target):
+    results = {}
+    batch = songs()
+    timed('append 10k', results, lambda: [queue.append(s) for s in batch])
+    timed('shuffle + unshuffle', results, lambda: (queue.shuffle(), queue.unshuffle()))
+    timed('first page', results, lambda: page(queue))
+    timed('skip to middle', results, lambda: queue.skip_to(skip_target))
+    timed('advance 4k tracks', results, lambda: [queue.advance() for _ in range(4_000)])
+    return results
+
+
+def main():
+    random.seed(0)
+    old = bench(ListQueue(), lambda q: q.page(0), TRACKS // 2)
+    new = bench(TrackQueue(history_size=20), lambda q: q.upcoming(PAGE_SIZE), TRACKS // 2)
+    print(f'{"operation":<22}{"list queue":>14}{"TrackQueue":>14}')
+    for label in old:
+        print(f'{label:<22}{old[label] * 1000:>12.2f}ms{new[label] * 1000:>12.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+"""Offline stand-ins for yt-dlp, Spotify and the Discord objects the music cog touches.
+
+Extraction results are replayed from a recorded yt-dlp JSON (``fixtures/video.json``,
+written by ``music_pipeline.py record``) or, when there is none, from a built-in
+synthetic template with the same shape. The repo ships no recording, so unless
+one was made locally the numbers come from the synthetic template. Every call sleeps a fixed, scaled latency so runs
+on different commits are comparable.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Seconds per call at scale 1.0, in the ballpark of real extractions from a home server
+LATENCY = {
+    'video': 0.60,           # full extraction of one watch URL
+    'search': 0.70,          # ytsearch1 with full extraction of the result
+    'flat_search': 0.35,     # flat ytsearchN
+    'flat_playlist': 0.40,   # flat playlist request (or continuation page of 100), plus per entry below
+    'flat_entry': 0.002,
+    'spotify': 0.12,         # one Spotify Web API call
+    'ffmpeg_start': 0.80,    # ffmpeg connecting to googlevideo and buffering before its first frame
+    'loudness': 4.0,         # ffmpeg loudnorm pass over a whole track
+}
+
+_TEMPLATE = {
+    'id': None,
+    'title': None,
+    'duration': 215,
+    'webpage_url': None,
+    'original_url': None,
+    'thumbnail': None,
+    'thumbnails': [{'url': None, 'width': 1280, 'height': 720}],
+    'acodec': 'opus',
+    'vcodec': 'none',
+    'abr': 130.0,
+    'ext': 'webm',
+    'url': None,
+    'formats': [
+        {'format_id': '251', 'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none', 'abr': 130.0, 'url': None},
+        {'format_id': '140', 'ext': 'm4a', 'acodec': 'mp4a.40.2', 'vcodec': 'none', 'abr': 129.0, 'url': None},
+    ],
+}
+
+
+class Replay:
+    """Latency model and recorded template shared by the stubs."""
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+        self.template = _TEMPLATE
+        path = os.path.join(FIXTURES, 'video.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                self.template = json.load(f)
+        self.calls: dict[str, int] = {}
+
+    def wait(self, kind: str, extra: float = 0.0):
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        time.sleep((LATENCY[kind] + extra) * self.scale)
+
+    async def wait_async(self, kind: str, extra: float = 0.0):
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        await asyncio.sleep((LATENCY[kind] + extra) * self.scale)
+
+    @staticmethod
+    def video_id(seed: str) -> str:
+        return hashlib.sha1(seed.encode()).hexdigest()[:11]
+
+    def video(self, video_id: str, title: str, duration: int | None = None) -> dict:
+        info = copy.deepcopy(self.template)
+        stream = f'https://rr1---sn-bench.googlevideo.com/videoplayback?id={video_id}&expire={int(time.time()) + 21600}'
+        info.update(id=video_id, title=title, webpage_url=f'https://www.youtube.com/watch?v={video_id}',
+                    original_url=f'https://www.youtube.com/watch?v={video_id}', url=stream,
+                    thumbnail=f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg')
+        if duration is not None:
+            info['duration'] = duration
+        for fmt in info.get('formats') or []:
+            fmt['url'] = stream
+        return info
+
+    def flat_entry(self, video_id: str, title: str, duration: int | None = None) -> dict:
+        return {'_type': 'url', 'ie_key': 'Youtube', 'id': video_id, 'title': title,
+                'url': f'https://www.youtube.com/watch?v={video_id}', 'duration': duration or 215,
+                'thumbnails': [{'url': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg'}]}
+
+
+def playlist_size(url: str) -> int:
+    """Bench playlists encode their size in the id, e.g. ``list=BENCH100`` or ``playlist/bench100``."""
+    match = re.search(r'bench(\d+)', url, re.IGNORECASE)
+    return int(match.group(1)) if match else 10
+
+
+def spotify_track(index: int) -> dict:
+    return {
+        'id': f'sp{index:06d}',
+        'name': f'Bench Song {index}',
+        'artists': [{'name': f'Bench Artist {index % 97}'}],
+        'duration_ms': (180 + index % 120) * 1000,
+        'external_ids': {'isrc': f'BENCH{index:07d}'},
+    }
+
+
+def make_youtube_dl(replay: Replay):
+    """A YoutubeDL replacement class bound to ``replay``."""
+
+    class ReplayYoutubeDL:
+        def __init__(self, params=None):
+            self.params = dict(params or {})
+
+        @staticmethod
+        def sanitize_info(info):
+            return info
+
+        def close(self):
+            pass
+
+        @staticmethod
+        def _lazy_entries(url, total):
+            # Like YouTube's tab extractor: each continuation of 100 entries is requested when reached
+            for i in range(1, total + 1):
+                if i % 100 == 1 and i > 1:
+                    replay.wait('flat_playlist', LATENCY['flat_entry'] * 100)
+                yield replay.flat_entry(replay.video_id(f'{url}#{i}'), f'Playlist Song {i}')
+
+        def extract_info(self, url, download=False, ie_key=None, process=True):
+            flat = bool(self.params.get('extract_flat'))
+            search = re.match(r'ytsearch(\d*):(.*)', url)
+            if search:
+                count, query = int(search.group(1) or 1), search.group(2)
+                replay.wait('flat_search' if flat else 'search')
+                track = re.search(r'Bench Song (\d+)', query)
+                duration = 180 + int(track.group(1)) % 120 if track else None
+                make = replay.flat_entry if flat else replay.video
+                # The second-ranked result is the one whose duration matches the Spotify track
+                entries = [make(replay.video_id(f'{query}#{i}'), f'{query} ({i})',
+                                duration if i == 1 else 30 + i) for i in range(count)]
+                return {'_type': 'playlist', 'id': query, 'entries': entries}
+            if 'list=' in url and 'watch?v=' not in url:
+                total = playlist_size(url)
+                if not process:
+                    replay.wait('flat_playlist', LATENCY['flat_entry'] * min(total, 100))
+                    return {'_type': 'playlist', 'id': url, 'title': 'Bench playlist',
+                            'entries': self._lazy_entries(url, total)}
+                start, end = 1, total
+                items = self.params.get('playlist_items')
+                if items:
+                    first, _, last = str(items).partition('-')
+                    start = int(first)
+                    end = total if _ and not last else int(last or first)
+                entries = [replay.flat_entry(replay.video_id(f'{url}#{i}'), f'Playlist Song {i}')
+                           for i in range(start, min(end, total) + 1)]
+                replay.wait('flat_playlist', LATENCY['flat_entry'] * len(entries))
+                return {'_type': 'playlist', 'id': url, 'title': 'Bench playlist', 'entries': entries}
+            replay.wait('video')
+            video_id = url.split('v=')[-1].split('&')[0]
+            return replay.video(video_id, f'Video {video_id}')
+
+    return ReplayYoutubeDL
+
+
+def make_measure_loudness(replay: Replay):
+    """A measure_loudness replacement: takes the time of a full pass and reports a typical loud master."""
+
+    async def measure_loudness(audio_input, before_options=None, timeout=120.0):
+        replay.calls['loudness'] = replay.calls.get('loudness', 0) + 1
+        await asyncio.sleep(LATENCY['loudness'] * replay.scale)
+        return -9.5, -0.3
+
+    return measure_loudness
+
+
+class ReplaySpotify:
+    """Stands in for SpotifyClient, answering with generated tracks."""
+
+    def __init__(self, replay: Replay):
+        self.replay = replay
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def playlist_items(self, playlist_id, market=None, limit=100, offset=0, fields=None):
+        await self.replay.wait_async('spotify')
+        total = playlist_size(playlist_id)
+        return {'items': [{'track': spotify_track(i)} for i in range(offset, min(offset + limit, total))],
+                'total': total, 'next': None}
+
+    async def album_tracks(self, album_id, market=None, limit=50, offset=0):
+        await self.replay.wait_async('spotify')
+        total = playlist_size(album_id)
+        tracks = [spotify_track(i) for i in range(offset, min(offset + limit, total))]
+        for t in tracks:
+            t.pop('external_ids')  # simplified track objects carry no ISRC
+        return {'items': tracks, 'total': total, 'next': None}
+
+    async def track(self, url, market=None):
+        await self.replay.wait_async('spotify')
+        return spotify_track(0)
+
+
+class FakeAudioSource:
+    """Stands in for FFmpegOpusAudio / FFmpegPCMAudio without spawning ffmpeg.
+
+    The first read takes ``startup`` seconds, like ffmpeg opening a remote stream.
+    """
+
+    _process = None
+    startup = 0.0
+
+    def __init__(self, source, **kwargs):
+        self.source = source
+        self._started = False
+
+    @classmethod
+    async def probe(cls, source, **kwargs):
+        return 'opus', 128
+
+    def read(self):
+        if not self._started:
+            self._started = True
+            time.sleep(self.startup)
+        return b'\xf8\xff\xfe'  # one Opus silence frame
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        pass
+
+
+class FakeVoiceClient:
+    """Reads the first frame of each played source on a thread, like discord.py's audio player.
+
+    ``on_audio`` is called from that thread once the frame is there.
+    """
+
+    def __init__(self, on_audio):
+        self.on_audio = on_audio
+        self.source = None
+        self.after = None
+        self.paused = False
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self.source is not None and not self.paused
+
+    def is_paused(self):
+        return self.paused
+
+    def play(self, source, after=None):
+        self.source = source
+        self.after = after
+        threading.Thread(target=self._first_frame, args=(source,), daemon=True).start()
+
+    def _first_frame(self, source):
+        source.read()
+        self.on_audio()
+
+    def finish(self):
+        """End the current track as if its last frame had been played."""
+        after, self.source, self.after = self.after, None, None
+        if after:
+            after(None)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def stop(self):
+        self.source = None
+
+    async def disconnect(self):
+        self.source = None
+
+    async def move_to(self, channel):
+        pass
+
+
+class FakeVoiceChannel:
+    id = 2
+
+    def __init__(self, on_audio):
+        self.on_audio = on_audio
+
+    async def connect(self):
+        return FakeVoiceClient(self.on_audio)
+
+
+class FakeMessage:
+    _next_id = 100
+
+    def __init__(self, channel):
+        FakeMessage._next_id += 1
+        self.id = FakeMessage._next_id
+        self.channel = channel
+
+    async def edit(self, **kwargs):
+        return self
+
+    async def delete(self):
+        pass
+
+
+class FakeTextChannel:
+    id = 3
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+        return FakeMessage(self)
+
+
+class _Avatar:
+    url = 'https://cdn.discordapp.com/embed/avatars/0.png'
+
+
+class _Voice:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+class FakeUser:
+    id = 4
+    display_name = 'bench'
+    avatar = _Avatar()
+
+    def __init__(self, voice_channel):
+        self.voice = _Voice(voice_channel)
+
+    def __str__(self):
+        return self.display_name
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 1):
+        self.id = guild_id
+
+
+class _Response:
+    async def defer(self, *args, **kwargs):
+        pass
+
+    async def send_message(self, *args, **kwargs):
+        pass
+
+
+class _Followup:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def send(self, *args, **kwargs):
+        return FakeMessage(self.channel)
+
+
+class FakeInteraction:
+    def __init__(self, user, channel, guild_id: int = 1):
+        self.user = user
+        self.guild = FakeGuild(guild_id)
+        self.channel = channel
+        self.response = _Response()
+        self.followup = _Followup(channel)
+
+
+class _BotUser:
+    id = 5
+
+
+class FakeClient:
+    def __init__(self, text_channel):
+        self.user = _BotUser()
+        self.loop = asyncio.get_event_loop()
+        self.text_channel = text_channel
+
+    def get_channel(self, channel_id):
+        return self.text_channel
+
+    def get_guild(self, guild_id):
+        return None
+
+    def is_closed(self):
+        return False
+
+    async def wait_until_ready(self):
+        pass
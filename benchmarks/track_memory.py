@@ -0,0 +1,57 @@
+"""Memory of 10k queued tracks: Track entries vs the previous song dicts with a channel per entry.
+
+Run from the repository root:  python benchmarks/track_memory.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from logic.music.track import Track  # noqa: E402
+
+TRACKS = 10_000
+DISTINCT_TITLES = 6_000  # playlists repeat songs; the repeats are parsed into new strings all the same
+
+
+def flat_entries():
+    """What yt-dlp's flat playlist extraction hands the cog, one fresh string per field."""
+    return [{'id': f'{i % DISTINCT_TITLES:011d}', 'title': ''.join(['Artist ', str(i % DISTINCT_TITLES), ' - Song']),
+             'thumbnail': f'https://i.ytimg.com/vi/{i % DISTINCT_TITLES:011d}/hqdefault.jpg'}
+            for i in range(TRACKS)]
+
+
+def dict_entry(number, e, channel):
+    link = f'https://www.youtube.com/watch?v={e["id"]}'
+    song = {'link': link, 'thumbnail': e['thumbnail'], 'original_url': link, 'source': None, 'title': e['title']}
+    return {'id': number, 'song': song, 'channel': channel, 'order': float(number)}
+
+
+def track_entry(number, e, channel):
+    return {'id': number, 'song': Track(e['id'], e['title']), 'order': float(number)}
+
+
+def measure(build) -> tuple[int, list]:
+    channel = object()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    entries = flat_entries()
+    queue = [build(number, e, channel) for number, e in enumerate(entries)]
+    # The parsed playlist page is dropped once queued; only what the queue keeps counts
+    del entries
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename')), queue
+
+
+def main():
+    old, _ = measure(dict_entry)
+    new, _ = measure(track_entry)
+    print(f'{"queue entries":<22}{"total":>12}{"per track":>12}')
+    for label, size in (('song dicts', old), ('Track', new)):
+        print(f'{label:<22}{size / 1024:>10.0f}KB{size / TRACKS:>11.0f}B')
+    print(f'saved {100 * (1 - new / old):.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -49,3 +49,66 @@ CREATE TABLE IF NOT EXISTS MESSAGES (
     channel_id BIGINT NOT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
+
+CREATE TABLE IF NOT EXISTS MUSIC_QUERY_CACHE (
+    QUERY_KEY VARCHAR(255) NOT NULL PRIMARY KEY,   -- normalized free-text search
+    VIDEO_ID VARCHAR(32) NOT NULL,
+    TITLE VARCHAR(500),
+    HITS INT NOT NULL DEFAULT 0,
+    RESOLVED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    LAST_HIT_AT TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS MUSIC_AUDIO_CACHE (
+    VIDEO_ID VARCHAR(32) NOT NULL PRIMARY KEY,
+    TITLE VARCHAR(500),                    -- last title it was played under, for the /play suggestions
+    PLAY_COUNT INT NOT NULL DEFAULT 0,
+    FILE_PATH VARCHAR(500),                -- set once the audio is stored on disk
+    SIZE_BYTES BIGINT NOT NULL DEFAULT 0,
+    LAST_PLAYED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CACHED_AT TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS MUSIC_TRACK_IDENTITY (
+    SPOTIFY_ID VARCHAR(32) NOT NULL PRIMARY KEY,
+    ISRC VARCHAR(16),                      -- same recording across albums/compilations
+    VIDEO_ID VARCHAR(32) NOT NULL,
+    DURATION_DIFF INT,                     -- YouTube minus Spotify duration (s); NULL if no duration match
+    HITS INT NOT NULL DEFAULT 0,
+    MATCHED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    LAST_HIT_AT TIMESTAMP NULL,
+    INDEX IDX_MUSIC_TRACK_IDENTITY_ISRC (ISRC)
+);
+
+CREATE TABLE IF NOT EXISTS MUSIC_LOUDNESS (
+    VIDEO_ID VARCHAR(32) NOT NULL PRIMARY KEY,
+    INTEGRATED_LUFS DECIMAL(5, 2) NOT NULL,
+    TRUE_PEAK_DB DECIMAL(5, 2) NOT NULL,
+    GAIN_DB DECIMAL(5, 2) NOT NULL,        -- applied at playback
+    ANALYZED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS MUSIC_SESSION (
+    GUILD_ID BIGINT NOT NULL PRIMARY KEY,
+    VOICE_CHANNEL_ID BIGINT NOT NULL,
+    TEXT_CHANNEL_ID BIGINT,
+    USER_ID BIGINT,                        -- who started the current track
+    CURRENT_ENTRY INT,
+    HISTORY MEDIUMTEXT,                    -- comma separated entry ids, in play order
+    UPCOMING MEDIUMTEXT,                   -- idem, so a shuffled order survives
+    SHUFFLED BOOLEAN NOT NULL DEFAULT FALSE,
+    IS_PLAYING BOOLEAN NOT NULL DEFAULT FALSE,
+    POSITION_SECONDS DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    UPDATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS MUSIC_SESSION_ENTRY (
+    GUILD_ID BIGINT NOT NULL,
+    ENTRY_ID INT NOT NULL,
+    ORDER_KEY DOUBLE NOT NULL,             -- position in the unshuffled queue
+    VIDEO_ID VARCHAR(32),
+    TITLE VARCHAR(500),
+    URL VARCHAR(500),                      -- only when it is not the video's watch URL
+    THUMBNAIL VARCHAR(500),                -- only when it is not the video's default thumbnail
+    PRIMARY KEY (GUILD_ID, ENTRY_ID)
+);
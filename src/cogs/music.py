@@ -1,26 +1,39 @@
 import asyncio
+import os
 import re
-import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from itertools import islice
 from urllib import parse, request
 
 import discord
 from discord import app_commands
-from discord.ext import commands
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError, ExtractorError
+from discord.ext import commands, tasks
 
 from random import shuffle
 import settings
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+from logic.music.player import GuildPlayer
+from logic.music.stream_cache import StreamCache
+from logic.music.query_store import QueryStore
+from logic.music.extraction import ExtractionEngine, ExtractionError, extract_info, download_audio, list_playlist
+from logic.music.audio_cache import AudioCache
+from logic.music.playback import FRAME_SECONDS, MeteredSource, StreamCpuStats
+from logic.music.mapping import OrderedMapper
+from logic.music.track_index import TrackIndex
+from logic.music import tracing
+from logic.music.tracing import TraceStats
+from logic.music.loudness import LoudnessStore, gain_for, measure_loudness
+from logic.music.session_store import SessionStore
+from logic.music.suggestions import SuggestionIndex
+from logic.music.single_flight import SingleFlight
+from logic.music.scheduler import JobScheduler, Priority, current_priority, set_priority
+from logic.music.governor import YoutubeGovernor
+from logic.music.track import Track, thumbnail_url, watch_url
+from logic.music.spotify import SpotifyClient, SpotifyError, spotify_id
+from logic.utilities import is_role_allowed
 import subprocess
 
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-    client_id=settings.SPOTIFY_CLIENT_ID,
-    client_secret=settings.SPOTIFY_CLIENT_SECRET
-))
-
 ytdl_format_options = {
     # 'format': 'bestaudio/best',
     'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
@@ -49,28 +62,70 @@ SINGLE_OPTS = {
     "format": "bestaudio/best",
 }
 
+# Flat listing used by progressive playlist enqueueing: the head entry (playlist_items=1), then list_playlist
+FLAT_PLAYLIST_OPTS = {
+    **ytdl_format_options,
+    "extract_flat": "in_playlist",
+    "noplaylist": False,
+    "skip_download": True,
+}
+
+SEARCH_OPTS = {"quiet": True, "noplaylist": True}
+
+# Flat search: ids, titles and durations of the top results without extracting each video
+CANDIDATE_OPTS = {"quiet": True, "noplaylist": True, "extract_flat": True, "skip_download": True}
+
+# Stores Opus/WebM audio of frequently played tracks in the on-disk audio cache
+DOWNLOAD_OPTS = {
+    **SINGLE_OPTS,
+    "format": "bestaudio[acodec=opus]/bestaudio[ext=webm]/bestaudio",
+    "outtmpl": os.path.join(settings.MUSIC_AUDIO_CACHE_PATH, "%(id)s.%(ext)s"),
+}
+
+# Option profiles served by the YoutubeDL instance pool
+YTDL_PROFILES = {
+    "single": SINGLE_OPTS,
+    "best": {**SINGLE_OPTS, "format": "best"},
+    "playlist": FAST_PLAYLIST_OPTS,
+    "flat": FLAT_PLAYLIST_OPTS,
+    "search": SEARCH_OPTS,
+    "candidates": CANDIDATE_OPTS,
+    "download": DOWNLOAD_OPTS,
+}
+
 
 ffmpeg_options = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn -b:a 256k'
 }
 
+# Local files from the audio cache need no reconnect handling
+ffmpeg_local_options = {
+    'options': '-vn -b:a 256k'
+}
+
 
 def _yt_watch_url(video_id: str) -> str:
-    return f"https://www.youtube.com/watch?v={video_id}"
+    return watch_url(video_id)
 
 
-def _yt_thumb(video_id: str) -> str:
-    # safe default if yt-dlp entry lacks thumbnails
-    return f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"
+def _yt_video_id(url: str) -> str:
+    if "v=" in url:
+        return url.split("v=")[-1].split("&")[0]
+    return url.rsplit("/", 1)[-1].split("?")[0]
 
 
-def _get_sp_playlist_id(url: str) -> str:
-    return url.split("/")[-1].split("?")[0]
+def _yt_thumb(video_id: str) -> str:
+    return thumbnail_url(video_id)
 
 
-def _get_sp_album_id(url: str) -> str:
-    return url.split("/")[-1].split("?")[0]
+def _flat_track(entry: dict, fallback_url: str) -> Track:
+    """Track of a flat playlist entry; its stream is resolved right before it plays."""
+    video_id = entry.get("id")
+    link = entry.get("webpage_url") or entry.get("url")
+    if not (link and link.startswith("http")):
+        link = _yt_watch_url(video_id) if video_id else fallback_url
+    return Track(video_id, entry.get("title"), url=link)
 
 
 def _pick_thumbnail(info: dict) -> str | None:
@@ -124,25 +179,16 @@ def create_playing_embed(title, author: discord.User, song):
     if type(song) is list:
         song = song[0]
     embed = discord.Embed(title=title,
-                          description=f'[{song["title"]}]({song["link"]})',
+                          description=f'[{song.title}]({song.link})',
                           color=discord.Color.from_str(
                               settings.DOURADINHOS_COLOR)
                           )
-    embed.set_thumbnail(url=song["thumbnail"])
+    embed.set_thumbnail(url=song.thumbnail)
     embed.set_footer(
         text=f'Song added by: {str(author)}', icon_url=author.avatar.url)
     return embed
 
 
-async def add_reactions(msg: discord.Message):
-    await asyncio.gather(
-        msg.add_reaction('⏮️'),
-        msg.add_reaction('⏯️'),
-        msg.add_reaction('⏭️'),
-        msg.add_reaction('🔀')
-    )
-
-
 async def delete_message(msg: discord.Message):
     await asyncio.sleep(5)
     await msg.delete()
@@ -152,11 +198,14 @@ def is_spotify_url(url):
     return "open.spotify.com" in url or "spotify.com" in url
 
 
-def get_spotify_track_info(url):
-    track = sp.track(url)
-    title = track['name']
-    artist = track['artists'][0]['name']
-    return f"{title} {artist}"
+def _spotify_track(track: dict) -> dict:
+    """The parts of a Spotify track object used to find it on YouTube."""
+    return {
+        "query": f'{track["name"]} {track["artists"][0]["name"]}',
+        "spotify_id": track.get("id"),
+        "isrc": (track.get("external_ids") or {}).get("isrc"),
+        "duration": (track.get("duration_ms") or 0) / 1000 or None,
+    }
 
 
 def is_spotify_playlist(url):
@@ -167,300 +216,426 @@ def is_spotify_album(url):
     return "album" in url
 
 
+def _format_percentiles(stats: TraceStats) -> str:
+    """Table of a TraceStats' rolling percentiles, in milliseconds."""
+    lines = []
+    for kind, spans in stats.percentiles().items():
+        outcomes = ', '.join(f'{outcome} {count}' for (k, outcome), count in stats.counts.items() if k == kind)
+        lines.append(f'{kind} ({outcomes})')
+        for name, p in spans.items():
+            lines.append(f'  {name:<14}{p["p50"] * 1000:>8.0f}{p["p90"] * 1000:>8.0f}{p["p99"] * 1000:>8.0f}'
+                         f'{p["count"]:>6}')
+    if not lines:
+        return ''
+    return f'{"":<16}{"p50":>8}{"p90":>8}{"p99":>8}{"n":>6}\n' + '\n'.join(lines)
+
+
+def _format_scheduler(scheduler: JobScheduler) -> str:
+    """Extraction queue depth and wait time per priority tier, as a fixed-width table."""
+    lines = [f'{"":<12}{"queued":>8}{"max":>6}{"jobs":>7}{"p50":>8}{"p95":>8}{"max":>8}']
+    for tier, s in scheduler.stats().items():
+        lines.append(f'{tier:<12}{s["queued"]:>8}{s["max_queued"]:>6}{s["jobs"]:>7}'
+                     f'{s["wait_p50"] * 1000:>6.0f}ms{s["wait_p95"] * 1000:>6.0f}ms{s["wait_max"] * 1000:>6.0f}ms')
+    return '\n'.join(lines)
+
+
+def _code_blocks(sections: list[str], limit: int = 2000) -> list[str]:
+    """Pack text sections into as few code-block messages of at most ``limit`` characters as possible.
+
+    Sections are kept whole when they fit a message; longer ones are split between lines.
+    """
+    room = limit - len('```\n```')
+    lines = []
+    for section in sections:
+        if len(section) <= room:
+            lines.append(section)
+        else:
+            lines.extend(line[:room] for line in section.split('\n'))
+    messages = []
+    current = ''
+    for text in lines:
+        if current and len(current) + 1 + len(text) > room:
+            messages.append(f'```\n{current}```')
+            current = ''
+        current = f'{current}\n{text}' if current else text
+    if current:
+        messages.append(f'```\n{current}```')
+    return messages
+
+
 class Music(commands.Cog):
     def __init__(self, client: commands.Bot):
         self.client = client
         self.logger = settings.get_logger()
-        self._queue = []
-        self.queue_index = 0
-        self.is_playing = False
-        self.is_connected = False
-        self.voice_client: discord.VoiceClient = None
+        self.players: dict[int, GuildPlayer] = {}
         self.executor = ThreadPoolExecutor()
-        self.last_played_msg = None
+        self.youtube = YoutubeGovernor(rate=settings.MUSIC_YOUTUBE_RATE, burst=settings.MUSIC_YOUTUBE_BURST,
+                                       reserve=settings.MUSIC_YOUTUBE_FOREGROUND_RESERVE,
+                                       cooldown=settings.MUSIC_YOUTUBE_COOLDOWN,
+                                       max_cooldown=settings.MUSIC_YOUTUBE_MAX_COOLDOWN)
+        self.extraction = ExtractionEngine(YTDL_PROFILES, mode=settings.MUSIC_EXTRACTION_MODE,
+                                           workers=settings.MUSIC_EXTRACTION_WORKERS,
+                                           concurrency=settings.MUSIC_EXTRACTION_CONCURRENCY,
+                                           timeout=settings.MUSIC_EXTRACTION_TIMEOUT,
+                                           max_uses=settings.MUSIC_YTDL_MAX_USES,
+                                           background_concurrency=settings.MUSIC_EXTRACTION_BACKGROUND_CONCURRENCY,
+                                           governor=self.youtube,
+                                           download_concurrency=settings.MUSIC_AUDIO_CACHE_DOWNLOAD_CONCURRENCY)
+        self.stream_cache = StreamCache(max_entries=settings.MUSIC_STREAM_CACHE_MAX_ENTRIES,
+                                        max_bytes=settings.MUSIC_STREAM_CACHE_MAX_BYTES)
+        self.resolves = SingleFlight()  # video id -> stream resolve in flight, shared by every caller
+        self.query_store = QueryStore(max_age_days=settings.MUSIC_QUERY_CACHE_MAX_AGE_DAYS)
+        self.track_index = TrackIndex()
+        self.suggestions = SuggestionIndex(max_entries=settings.MUSIC_SUGGESTIONS_MAX_ENTRIES,
+                                           half_life_days=settings.MUSIC_SUGGESTIONS_HALF_LIFE_DAYS)
+        self.audio_cache = AudioCache(settings.MUSIC_AUDIO_CACHE_PATH,
+                                      max_bytes=settings.MUSIC_AUDIO_CACHE_MAX_BYTES,
+                                      min_plays=settings.MUSIC_AUDIO_CACHE_MIN_PLAYS)
+        # Prefetch only starts while no foreground (/play, track start) extraction is running
+        self._foreground_jobs = 0
+        self._foreground_idle = asyncio.Event()
+        self._foreground_idle.set()
+        self._prefetch_slots = asyncio.Semaphore(settings.MUSIC_PREFETCH_CONCURRENCY)
+        self.stream_cpu = StreamCpuStats()
+        # 429 is not retried by the client: Music._sp_call waits out Retry-After for all concurrent calls
+        self.spotify = SpotifyClient(settings.SPOTIFY_CLIENT_ID, settings.SPOTIFY_CLIENT_SECRET,
+                                     connections=settings.MUSIC_SPOTIFY_CONNECTIONS,
+                                     refresh_margin=settings.MUSIC_SPOTIFY_TOKEN_REFRESH_MARGIN)
+        self._sp_retry_at = 0.0  # loop time before which Spotify asked us (429) not to call again
+        self.trace_stats = TraceStats(settings.MUSIC_TRACE_WINDOW)
+        self.loudness = LoudnessStore()
+        self._loudness_slots = asyncio.Semaphore(settings.MUSIC_LOUDNESS_CONCURRENCY)
+        self._loudness_jobs: dict[str, asyncio.Task] = {}  # video id -> analysis in flight
+        self.session_store = SessionStore()
+        self._checkpoint_lock = asyncio.Lock()  # a checkpoint never lands after the session was deleted
+        self._restore_task: asyncio.Task | None = None
         self.me_id = self.client.user.id
-        self.inactivity_timer: threading.Timer = None
-        self.shuffle_enabled = False
-        self._original_queue = None  # Store original queue order before shuffle
-
-    async def clear(self):
-        self.is_playing = False
-        self._queue = []
-        self.queue_index = 0
-
-    async def disconnect(self):
-        self.is_playing = False
-        self._queue = []
-        self.queue_index = 0
-        await self.voice_client.disconnect()
-        self.voice_client = None
-
-    def in_voice_channel(self):
-        return self.voice_client is not None
-
-    def exists_next_song_in_queue(self):
-        return self.queue_index + 1 < len(self._queue)
+        self.refresh_expiring_streams.start()
+        self.checkpoint_sessions.start()
+
+    async def cog_load(self):
+        self.spotify.start()
+        await asyncio.get_event_loop().run_in_executor(self.executor, self.audio_cache.load)
+        await asyncio.get_event_loop().run_in_executor(self.executor, self.suggestions.load)
+        self._restore_task = self.client.loop.create_task(self.restore_sessions())
+
+    def cog_unload(self):
+        self.refresh_expiring_streams.cancel()
+        self.checkpoint_sessions.cancel()
+        if self._restore_task:
+            self._restore_task.cancel()
+        for task in list(self._loudness_jobs.values()):
+            task.cancel()
+        self.client.loop.create_task(self.spotify.close())
+        self.extraction.shutdown()
+
+    def _unavailable(self, message: str) -> str:
+        """``message``, or a notice that YouTube is throttling the bot when that is why it failed."""
+        if self.youtube.is_open:
+            return (f'⚠️ YouTube is limiting the bot right now, music is degraded. '
+                    f'Try again in {max(1, round(self.youtube.retry_in / 60))} min ⚠️')
+        return message
+
+    def get_player(self, guild: discord.Guild) -> GuildPlayer:
+        """Return the music session for a guild, creating it on first use."""
+        player = self.players.get(guild.id)
+        if player is None:
+            player = GuildPlayer(guild.id, history_size=settings.MUSIC_QUEUE_HISTORY,
+                                 controller_interval=settings.MUSIC_CONTROLLER_INTERVAL,
+                                 trace_window=settings.MUSIC_TRACE_WINDOW)
+            self.players[guild.id] = player
+        return player
+
+    async def clear(self, player: GuildPlayer):
+        player.reset()
+
+    async def disconnect(self, player: GuildPlayer):
+        player.reset()
+        player.cancel_tasks()
+        player.reset_inactivity_timer()
+        if player.voice_client:
+            await player.voice_client.disconnect()
+        player.voice_client = None
+        if player.controller_view:
+            player.controller_view.stop()
+        await player.controller.close()
+        summary = _format_percentiles(player.trace_stats)
+        if summary:
+            self.logger.info(f"Music session {player.guild_id} time to first audio:\n{summary}")
+        self.players.pop(player.guild_id, None)
+        await self._delete_checkpoint(player)
 
     def not_me(self, member: discord.Member):
         return member.id != self.client.user.id
 
-    def start_inactivity_timer(self, minutes: int):
-        if self.inactivity_timer:
-            self.inactivity_timer.cancel()
-        self.inactivity_timer = threading.Timer(
-            minutes * 60, self.run_disconnect_coroutine)
-        self.inactivity_timer.start()
-
-    def run_disconnect_coroutine(self):
-        asyncio.run_coroutine_threadsafe(self.disconnect(), self.client.loop)
-
-    def reset_inactivity_timer(self):
-        if self.inactivity_timer:
-            self.inactivity_timer.cancel()
-            self.inactivity_timer = None
-
-    def clean_queue(self):
-        # Remove the song if it is 3 places down the queue
-        if self.queue_index > 2:
-            self._queue.pop(self.queue_index - 3)
-            self.queue_index -= 1  # Adjust index to keep it in sync
-
-    def get_current_song_from_queue(self):
-        return self._queue[self.queue_index]['song']
-
-    def get_current_from_queue(self):
-        return self._queue[self.queue_index]
-
-    def get_previous_song(self):
-        return self._queue[
-            self.queue_index - 1]['song'] if len(self._queue) > 1 and self.queue_index >= 1 else None
-
-    def is_queue_empty(self):
-        return len(self._queue) == 0
-
-    def clear_queue_impl(self):
-        current_music = self.get_current_from_queue()
-        if self.queue_index >= 0:
-            self._queue = [current_music]
-            self.queue_index = 0
-        else:
-            self._queue = []
-            self.queue_index = 0
+    def start_inactivity_timer(self, player: GuildPlayer, minutes: int):
+        player.start_inactivity_timer(
+            minutes, lambda: self.run_disconnect_coroutine(player))
+
+    def run_disconnect_coroutine(self, player: GuildPlayer):
+        asyncio.run_coroutine_threadsafe(
+            self.disconnect(player), self.client.loop)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState,
                                     after: discord.VoiceState):
+        player = self.players.get(member.guild.id)
+        if player is None:
+            return
         # Check if disconnected from discord
         if member == self.client.user and before.channel and not after.channel:
-            await self.clear()
+            await self.clear(player)
         if self.not_me(member) and before.channel is not None and after.channel != before.channel:
             remaining_member = before.channel.members
-            if len(remaining_member) == 1 and remaining_member[0].id == self.me_id and self.voice_client.is_connected():
-                await self.disconnect()
+            if len(remaining_member) == 1 and remaining_member[0].id == self.me_id \
+                    and player.voice_client and player.voice_client.is_connected():
+                await self.disconnect(player)
 
-    @commands.Cog.listener()
-    async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
-        if user != self.client.user:
-            # Next
-            channel = self.client.get_channel(reaction.message.channel.id)
-            if reaction.emoji == '⏭️':
-                await self.reaction_next(channel, reaction, user)
-            # Previous
-            elif reaction.emoji == '⏮️':
-                await self.reaction_previous(channel, reaction, user)
-            # Play/Pause
-            elif reaction.emoji == '⏯️':
-                await self.reaction_play_pause(channel, reaction, user)
-            # Shuffle
-            elif reaction.emoji == '🔀':
-                await self.reaction_shuffle(channel, reaction, user)
-
-    async def reaction_next(self, channel: discord.TextChannel, reaction: discord.Reaction, user: discord.User):
+    class ControllerView(discord.ui.View):
+        """Buttons of a session's now-playing message; the same view is kept and edited in place."""
+
+        def __init__(self, cog: "Music", player: GuildPlayer):
+            super().__init__(timeout=None)
+            self.cog = cog
+            self.player = player
+            self.refresh()
+
+        def refresh(self):
+            """Reflect pause and shuffle state in the buttons."""
+            self.play_pause.style = discord.ButtonStyle.secondary if self.player.is_playing \
+                else discord.ButtonStyle.primary
+            self.shuffle.style = discord.ButtonStyle.success if self.player.queue.shuffled \
+                else discord.ButtonStyle.secondary
+
+        async def _run(self, interaction: discord.Interaction, action):
+            await interaction.response.defer()
+            msg = await action(self.player, interaction.channel.id, interaction.user)
+            if msg:
+                await interaction.followup.send(msg, ephemeral=True)
+
+        @discord.ui.button(emoji='⏮️', style=discord.ButtonStyle.secondary)
+        async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self._run(interaction, self.cog.control_previous)
+
+        @discord.ui.button(emoji='⏯️', style=discord.ButtonStyle.secondary)
+        async def play_pause(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self._run(interaction, self.cog.control_play_pause)
+
+        @discord.ui.button(emoji='⏭️', style=discord.ButtonStyle.secondary)
+        async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self._run(interaction, self.cog.control_next)
+
+        @discord.ui.button(emoji='🔀', style=discord.ButtonStyle.secondary)
+        async def shuffle(self, interaction: discord.Interaction, button: discord.ui.Button):
+            await self._run(interaction, self.cog.control_shuffle)
+
+    def show_now_playing(self, player: GuildPlayer, user: discord.User, song: dict, channel=None):
+        """Point the session's controller message at a track; the edit is coalesced and off the caller's path."""
+        if player.controller_view is None:
+            player.controller_view = self.ControllerView(self, player)
+        player.controller_view.refresh()
+        player.controller.update(channel=channel, embed=create_playing_embed("▶️ Now playing", user, song),
+                                 view=player.controller_view)
+
+    def refresh_controller(self, player: GuildPlayer):
+        if player.controller_view:
+            player.controller_view.refresh()
+            player.controller.update(view=player.controller_view)
+
+    async def control_next(self, player: GuildPlayer, channel_id: int, user: discord.User) -> str | None:
         msg = None
-        if not self.in_voice_channel():
-            msg = await channel.send("❌ You need to be in a voice channel to you this command ❌")
-        elif not self.exists_next_song_in_queue():
-            msg = await channel.send("ℹ️ There is no next song in the queue. Replaying current song ℹ️")
-            self.voice_client.pause()
-            await self.play_music(reaction.message.channel.id, user)
-            self.reset_inactivity_timer()
+        if not player.in_voice_channel():
+            msg = "❌ You need to be in a voice channel to you this command ❌"
+        elif not player.exists_next_song_in_queue():
+            msg = "ℹ️ There is no next song in the queue. Replaying current song ℹ️"
+            player.voice_client.pause()
+            await self.play_music(player, channel_id, user)
+            player.reset_inactivity_timer()
         else:
-            self.queue_index += 1
-            self.voice_client.pause()
-            played = await self.play_music(reaction.message.channel.id, user)
+            player.record_transition(skipped=True)
+            player.queue.advance()
+            player.voice_client.pause()
+            played = await self.play_music(player, channel_id, user)
             if not played:
-                msg = await channel.send('⚠️ There are no songs to be played in the queue ⚠️')
+                msg = '⚠️ There are no songs to be played in the queue ⚠️'
             else:
-                self.clean_queue()
-                self.reset_inactivity_timer()
-        if msg:
-            await delete_message(msg)
+                player.reset_inactivity_timer()
+        return msg
 
-    async def reaction_previous(self, channel: discord.TextChannel, reaction: discord.Reaction, user: discord.User):
+    async def control_previous(self, player: GuildPlayer, channel_id: int, user: discord.User) -> str | None:
         msg = None
-        if not self.voice_client:
-            msg = await channel.send("❌ You need to be in a voice channel to use this command ❌")
-        elif self.queue_index <= 0:
-            msg = await channel.send("ℹ️ There is no previous song in the queue. Replaying current song ℹ️")
-            self.voice_client.pause()
-            await self.play_music(reaction.message.channel.id, user)
-            self.reset_inactivity_timer()
+        if not player.voice_client:
+            msg = "❌ You need to be in a voice channel to use this command ❌"
+        elif player.queue.previous is None:
+            msg = "ℹ️ There is no previous song in the queue. Replaying current song ℹ️"
+            player.voice_client.pause()
+            await self.play_music(player, channel_id, user)
+            player.reset_inactivity_timer()
         else:
-            self.queue_index -= 1
-            self.voice_client.pause()
-            played = await self.play_music(reaction.message.channel.id, user)
+            player.queue.back()
+            player.voice_client.pause()
+            played = await self.play_music(player, channel_id, user)
             if not played:
-                msg = await channel.send('⚠️ There are no songs to be played in the queue ⚠️')
-        if msg:
-            await delete_message(msg)
-
-    async def reaction_play_pause(self, channel: discord.TextChannel, reaction: discord.Reaction, user: discord.User):
-        msg = None
-        if not self.voice_client:
-            msg = await channel.send("⚠️ There is no audio to be paused at the moment ⚠️")
-        elif self.is_playing:
-            msg = await channel.send(f"⏯️ Audio Paused by {user.display_name}")
-            self.is_playing = False
-            self.voice_client.pause()
-            self.start_inactivity_timer(5)
-        else:
-            msg = await channel.send(f"⏯️ Audio Resumed by {user.display_name}")
-            self.is_playing = True
-            self.voice_client.resume()
-            self.reset_inactivity_timer()
-        await reaction.message.clear_reactions()
-        await add_reactions(reaction.message)
-        if msg:
-            await delete_message(msg)
-
-    async def reaction_shuffle(self, channel: discord.TextChannel, reaction: discord.Reaction, user: discord.User):
-        msg = None
-        if self.is_queue_empty():
-            msg = await channel.send("❌ The queue is empty ❌")
+                msg = '⚠️ There are no songs to be played in the queue ⚠️'
+        return msg
+
+    async def control_play_pause(self, player: GuildPlayer, channel_id: int, user: discord.User) -> str | None:
+        if not player.voice_client:
+            return "⚠️ There is no audio to be paused at the moment ⚠️"
+        elif player.is_playing:
+            msg = f"⏯️ Audio Paused by {user.display_name}"
+            player.is_playing = False
+            player.voice_client.pause()
+            self.start_inactivity_timer(player, 5)
         else:
-            self.shuffle_enabled = not self.shuffle_enabled
-
-            if self.shuffle_enabled:
-                # Save original queue order before shuffling
-                self._original_queue = self._queue.copy()
-                # Shuffle the remaining songs (everything after current)
-                if self.exists_next_song_in_queue():
-                    upcoming = self._queue[self.queue_index + 1:]
-                    shuffle(upcoming)
-                    self._queue[self.queue_index + 1:] = upcoming
-                    msg = await channel.send(f'🔀 Shuffle enabled by {user.display_name}')
-                else:
-                    msg = await channel.send(f'🔀 Shuffle enabled (no songs to shuffle) by {user.display_name}')
+            msg = f"⏯️ Audio Resumed by {user.display_name}"
+            player.is_playing = True
+            player.voice_client.resume()
+            player.reset_inactivity_timer()
+        self.refresh_controller(player)
+        return msg
+
+    async def control_shuffle(self, player: GuildPlayer, channel_id: int, user: discord.User) -> str | None:
+        if player.is_queue_empty():
+            return "❌ The queue is empty ❌"
+        if not player.queue.shuffled:
+            # Shuffle the remaining songs (everything after current)
+            player.queue.shuffle()
+            if player.exists_next_song_in_queue():
+                msg = f'🔀 Shuffle enabled by {user.display_name}'
             else:
-                # Restore original queue order
-                if self._original_queue:
-                    # Restore from saved position onwards
-                    self._queue[self.queue_index +
-                                1:] = self._original_queue[self.queue_index + 1:]
-                    self._original_queue = None
-                msg = await channel.send(f'➡️ Shuffle disabled by {user.display_name}')
-
-            await reaction.message.clear_reactions()
-            await add_reactions(reaction.message)
-
-        if msg:
-            await delete_message(msg)
-
-    async def join_voice_channel(self, text_channel, voice_channel):
+                msg = f'🔀 Shuffle enabled (no songs to shuffle) by {user.display_name}'
+        else:
+            # Restore original queue order
+            player.queue.unshuffle()
+            msg = f'➡️ Shuffle disabled by {user.display_name}'
+        self.schedule_prefetch(player)
+        self.refresh_controller(player)
+        return msg
+
+    async def join_voice_channel(self, player: GuildPlayer, text_channel, voice_channel):
         """Join a voice channel
 
         Args:
+            :param player: Guild music session
             :param voice_channel: Channel to send messages to
             :param text_channel: Channel to join
         """
         # Check if already connected to a channel
-        if self.voice_client is None or not self.voice_client.is_connected():
+        if player.voice_client is None or not player.voice_client.is_connected():
             # Try to connect to the channel
-            self.voice_client = await voice_channel.connect()
-            if self.voice_client is None:
+            with tracing.span("voice connect"):
+                player.voice_client = await voice_channel.connect()
+            if player.voice_client is None:
                 channel = self.client.get_channel(text_channel)
                 await channel.send('⚠️ Could not connect to the channel ⚠️')
         else:
             # Move to channel
-            await self.voice_client.move_to(voice_channel)
+            with tracing.span("voice connect"):
+                await player.voice_client.move_to(voice_channel)
 
-    async def pause(self, itr: discord.Interaction):
-        if not self.voice_client:
+    async def pause(self, player: GuildPlayer, itr: discord.Interaction):
+        if not player.voice_client:
             await itr.response.send_message('❌ There is no audio playing at the moment ❌')
-        elif self.is_playing:
-            self.is_playing = False
-            self.voice_client.pause()
+        elif player.is_playing:
+            player.is_playing = False
+            player.voice_client.pause()
 
-    async def play_next(self, user: discord.User, force: bool = False):
+    async def play_next(self, player: GuildPlayer, user: discord.User, force: bool = False):
         """Plays the next song asynchronously"""
 
-        if not self.is_playing and not force:
+        if not player.is_playing and not force:
             return
 
-        if self.exists_next_song_in_queue():
-            self.is_playing = True
-            self.queue_index += 1
-
-            song = self.get_current_song_from_queue()
-            message = create_playing_embed("▶️ Now playing", user, song)
-
-            channel = self.client.get_channel(self.last_played_msg.channel.id)
-
-            # Delete the last message asynchronously
-            if self.last_played_msg:
-                try:
-                    await self.last_played_msg.delete()
-                except Exception as e:
-                    print(f"Error deleting last message: {e}")
+        if player.exists_next_song_in_queue():
+            self._begin_trace("transition", player)
+            player.is_playing = True
+            song = player.queue.advance()['song']
+            self.show_now_playing(player, user, song)
 
-            # Send new playing message
-            try:
-                self.last_played_msg = await channel.send(embed=message, silent=True)
-            except Exception as e:
-                print(f"Error sending playing message: {e}")
-
-            # Add reactions asynchronously
-            try:
-                await add_reactions(self.last_played_msg)
-            except Exception as e:
-                print(f"Error adding reactions: {e}")
-
-            self.clean_queue()
             # Play next song
-            self.play_audio(user, song)
+            self.play_audio(player, user, song)
 
         else:
-            self.queue_index += 1
-            self.is_playing = False
+            player.queue.advance()
+            player.is_playing = False
 
-    async def _sp_fetch_playlist_page(self, playlist_id: str, offset: int, limit: int = 100, market: str = "PT"):
+    async def _sp_call(self, run):
+        """Await a Spotify call (``run()``), waiting out rate limits (429 Retry-After).
+
+        The wait is shared, so concurrent page fetches all back off together.
+        """
         loop = asyncio.get_event_loop()
+        for attempt in range(settings.MUSIC_SPOTIFY_MAX_RETRIES + 1):
+            delay = self._sp_retry_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                with tracing.span("spotify"):
+                    return await run()
+            except SpotifyError as e:
+                if e.http_status != 429 or attempt == settings.MUSIC_SPOTIFY_MAX_RETRIES:
+                    raise
+                retry_after = e.retry_after if e.retry_after is not None else 1.0
+                self._sp_retry_at = max(self._sp_retry_at, loop.time() + retry_after)
+                self.logger.warning(f"Spotify rate limit hit, retrying in {retry_after:.0f}s")
 
-        def run():
+    async def _sp_fetch_playlist_page(self, playlist_id: str, offset: int, limit: int = 100, market: str = "PT"):
+        return await self._sp_call(lambda: self.spotify.playlist_items(
+            playlist_id, market=market, limit=limit, offset=offset,
             # Only the fields we need = faster + smaller payload
-            return sp.playlist_items(
-                playlist_id, market=market, limit=limit, offset=offset,
-                fields="items(track(name,artists(name))),total,next"
-            )
-
-        return await loop.run_in_executor(self.executor, run)
+            fields="items(track(id,name,duration_ms,external_ids(isrc),artists(name))),total,next"
+        ))
 
     async def _sp_fetch_album_page(self, album_id: str, offset: int, limit: int = 50, market: str = "PT"):
+        return await self._sp_call(lambda: self.spotify.album_tracks(
+            album_id, market=market, limit=limit, offset=offset
+        ))
+
+    async def _known_tracks(self, tracks: list[dict]) -> int:
+        """Fill in the video ids the identity index already has; returns how many it knew."""
+        tracks = [t for t in tracks if t]
+        if not tracks:
+            return 0
         loop = asyncio.get_event_loop()
-
-        def run():
-            return sp.album_tracks(
-                album_id, market=market, limit=limit, offset=offset
-            )
-
-        return await loop.run_in_executor(self.executor, run)
-
-    async def _yt_url_from_query(self, query: str) -> str | None:
-        """Use your existing search_youtube() to get a single watch URL."""
-        res = await self.search_youtube(query)
-        return res[0] if res else None
-
-    async def enqueue_spotify_playlist_progressive(self, url: str, user_channel, channel_to_notify,
+        known = await loop.run_in_executor(self.executor, self.track_index.lookup_many, tracks)
+        for t in tracks:
+            if t["spotify_id"] in known:
+                t["video_id"] = known[t["spotify_id"]]
+        return len(known)
+
+    async def _find_on_youtube(self, track: dict) -> tuple[str, int | None] | None:
+        """Search YouTube for a Spotify track; the best-ranked result with a matching duration wins."""
+        try:
+            info = await self.extraction.run(extract_info, "candidates",
+                                             f"ytsearch{settings.MUSIC_MATCH_CANDIDATES}:{track['query']}")
+        except Exception as e:
+            self.logger.warning("Failed mapping '%s': %s", track["query"], e)
+            return None
+        candidates = [c for c in (info or {}).get("entries") or [] if c and c.get("id")]
+        if not candidates:
+            return None
+        if track.get("duration"):
+            for c in candidates:
+                if c.get("duration") and \
+                        abs(c["duration"] - track["duration"]) <= settings.MUSIC_MATCH_DURATION_TOLERANCE:
+                    return c["id"], round(c["duration"] - track["duration"])
+        return candidates[0]["id"], None
+
+    async def _map_spotify_track(self, track: dict) -> Track | None:
+        """Map a Spotify track to a queue track, from the identity index or else a YouTube search."""
+        video_id = track.get("video_id")
+        if not video_id:
+            found = await self._find_on_youtube(track)
+            if not found:
+                return None
+            video_id, duration_diff = found
+            await asyncio.get_event_loop().run_in_executor(
+                self.executor, self.track_index.store, track, video_id, duration_diff)
+        # Keep Spotify title/artist label (avoids extra extraction per item); the stream is resolved at play time
+        return Track(video_id, track["query"])
+
+    async def enqueue_spotify_playlist_progressive(self, player: GuildPlayer, url: str, channel_to_notify,
                                                    shuffle_music: bool = False) -> int:
         """
         Enqueue first Spotify track now (mapped to YouTube), then resolve the rest in the background.
@@ -474,131 +649,118 @@ class Music(commands.Cog):
 
         # ---- 1) Fetch first track only
         if is_playlist:
-            pid = _get_sp_playlist_id(url)
+            pid = spotify_id(url)
             head = await self._sp_fetch_playlist_page(pid, offset=0, limit=1)
             items = head.get("items") or []
             if not items or not items[0].get("track"):
                 await channel_to_notify.send("❌ Could not read this Spotify playlist ❌")
                 return 0
-            t0 = items[0]["track"]
+            t0 = _spotify_track(items[0]["track"])
         else:
-            aid = _get_sp_album_id(url)
+            aid = spotify_id(url)
             head = await self._sp_fetch_album_page(aid, offset=0, limit=1)
             items = head.get("items") or []
             if not items:
                 await channel_to_notify.send("❌ Could not read this Spotify album ❌")
                 return 0
-            t0 = items[0]
-
-        q0 = f'{t0["name"]} {t0["artists"][0]["name"]}'
-        yt0 = await self._yt_url_from_query(q0)
-        if not yt0:
-            await channel_to_notify.send(f"❌ Could not find a YouTube match for **{q0}** ❌")
+            t0 = _spotify_track(items[0])
+
+        # First song has no pre-resolved source to avoid URL expiry; YouTube title is resolved on play
+        await self._known_tracks([t0])
+        first_song = await self._map_spotify_track(t0)
+        if not first_song:
+            await channel_to_notify.send(
+                self._unavailable(f"❌ Could not find a YouTube match for **{t0['query']}** ❌"))
             return 0
-
-        # Build first song (no pre-resolved source to avoid URL expiry)
-        vid0 = yt0.split(
-            "v=")[-1].split("&")[0] if "v=" in yt0 else yt0.rsplit("/", 1)[-1]
-        first_song = {
-            "link": yt0,
-            "thumbnail": _yt_thumb(vid0),
-            "original_url": yt0,
-            "source": None,  # resolve right before playback
-            "title": q0,  # use Spotify title/artist now; YouTube title will be resolved on play
-        }
-        self._queue.append({"song": first_song, "channel": user_channel})
+        player.queue.append(first_song)
 
         # ---- 2) Background task: map the remaining tracks to YouTube and append
-        async def fetch_rest_spotify():
+        def append_song(song: Track):
+            player.queue.append(song)
+            if player.queue.upcoming_count() <= settings.MUSIC_PREFETCH_MAX:
+                self.schedule_prefetch(player)
+
+        total = head.get("total") or 0
+        page_size = 100 if is_playlist else 50
+        page_slots = asyncio.Semaphore(settings.MUSIC_SPOTIFY_PAGE_CONCURRENCY)
+        known = 0
+
+        async def map_page(mapper: OrderedMapper, offset: int):
+            # Every position of the page gets a sequence number (None when there is
+            # nothing to map) so later pages are not held back by a gap
+            nonlocal known
+            expected = min(page_size, total - offset)
             try:
-                added = 0
-                if is_playlist:
-                    total = head.get("total") or 0
-                    offset = 1
-                    page_size = 100
-                    while offset < total:
+                async with page_slots:
+                    if is_playlist:
                         page = await self._sp_fetch_playlist_page(pid, offset=offset, limit=page_size)
                         entries = page.get("items") or []
-                        queries = [f'{it["track"]["name"]} {it["track"]["artists"][0]["name"]}'
-                                   for it in entries if it and it.get("track")]
-                        batch_songs = await self._resolve_queries_to_songs(queries, shuffle_music)
-                        for s in batch_songs:
-                            self._queue.append(
-                                {"song": s, "channel": user_channel})
-                        added += len(batch_songs)
-                        offset += page_size
-                else:
-                    total = head.get("total") or 0
-                    offset = 1
-                    page_size = 50
-                    while offset < total:
+                        tracks = [_spotify_track(it["track"]) if it and it.get("track") else None
+                                  for it in entries]
+                    else:
                         page = await self._sp_fetch_album_page(aid, offset=offset, limit=page_size)
                         entries = page.get("items") or []
-                        queries = [
-                            f'{it["name"]} {it["artists"][0]["name"]}' for it in entries if it]
-                        batch_songs = await self._resolve_queries_to_songs(queries, shuffle_music)
-                        for s in batch_songs:
-                            self._queue.append(
-                                {"song": s, "channel": user_channel})
-                        added += len(batch_songs)
-                        offset += page_size
-
-                if added:
-                    await channel_to_notify.send(f"📜 Added +{added} more from Spotify.")
+                        tracks = [_spotify_track(it) if it else None for it in entries]
+            except Exception as ex:
+                self.logger.warning("Spotify page at offset %s failed: %s", offset, ex)
+                tracks = []
+            # Tracks already in the identity index skip the YouTube search; if the lookup
+            # fails the page is still mapped, just all through YouTube
+            try:
+                found = await self._known_tracks(tracks)
+            except Exception as ex:
+                self.logger.warning("Track index lookup for the page at offset %s failed: %s", offset, ex)
+                found = 0
+            known += found
+            tracks += [None] * (expected - len(tracks))
+            if shuffle_music:
+                shuffle(tracks)
+            for i, track in enumerate(tracks):
+                await mapper.put(track, seq=offset + i)
+
+        async def fetch_rest_spotify():
+            # All page offsets are known from the head request, so pages are fetched
+            # concurrently and handed to the mapper as they arrive; the mapper appends
+            # each track as soon as all tracks before it are mapped
+            set_priority(Priority.BACKGROUND, player.guild_id)
+            try:
+                async with OrderedMapper(self._map_spotify_track, append_song,
+                                         workers=settings.MUSIC_SPOTIFY_MAPPING_WORKERS,
+                                         window=settings.MUSIC_SPOTIFY_MAPPING_WINDOW, start=1) as mapper:
+                    await asyncio.gather(*(map_page(mapper, offset) for offset in range(1, total, page_size)))
+                    await mapper.join()
+
+                index = self.track_index.stats()
+                self.logger.info(f"Spotify import: {known}/{total - 1} tracks from the identity index "
+                                 f"(overall hit rate {index['hit_rate']:.0%})")
+                if mapper.emitted:
+                    self.schedule_prefetch(player)
+                    await channel_to_notify.send(f"📜 Added +{mapper.emitted} more from Spotify "
+                                                 f"({known} already matched).")
             except Exception as ex:
                 self.logger.exception(
                     "Background Spotify mapping failed: %s", ex)
 
-        self.client.loop.create_task(fetch_rest_spotify())
+        player.spawn(fetch_rest_spotify(), background=True)
         return 1
 
-    async def _resolve_queries_to_songs(self, queries: list[str], shuffle_music: bool) -> list[dict]:
-        """Map a list of 'title artist' queries to song dicts using your YouTube search, with modest concurrency."""
-        # Concurrency limiter to be nice to YouTube and your host
-        sem = asyncio.Semaphore(6)
-
-        async def process(q: str) -> dict | None:
-            async with sem:
-                try:
-                    yt_url = await self._yt_url_from_query(q)
-                    if not yt_url:
-                        return None
-                    vid = yt_url.split(
-                        "v=")[-1].split("&")[0] if "v=" in yt_url else yt_url.rsplit("/", 1)[-1]
-                    return {
-                        "link": yt_url,
-                        "thumbnail": _yt_thumb(vid),
-                        "original_url": yt_url,
-                        "source": None,  # resolve at play time
-                        "title": q,  # keep Spotify title/artist label; avoids extra extraction per item
-                    }
-                except Exception as e:
-                    self.logger.warning("Failed mapping '%s': %s", q, e)
-                    return None
-
-        # Process in chunks to avoid giant gather on huge playlists
-        out: list[dict] = []
-        CHUNK = 25
-        for i in range(0, len(queries), CHUNK):
-            chunk = queries[i:i + CHUNK]
-            results = await asyncio.gather(*(process(q) for q in chunk))
-            items = [r for r in results if r]
-            if shuffle_music:
-                shuffle(items)
-            out.extend(items)
-        return out
-
-    async def resolve_stream(self, watch_url: str) -> str | None:
-        loop = asyncio.get_event_loop()
-
-        def run():
-            from yt_dlp import YoutubeDL
-            with YoutubeDL({**ytdl_format_options, "noplaylist": True, "format": "bestaudio/best"}) as yt:
-                return yt.extract_info(watch_url, download=False)
-
+    async def resolve_stream(self, watch_url: str, refresh: bool = False) -> str | None:
+        """Return a playable stream URL, served from the shared stream cache while it is still valid."""
+        video_id = _yt_video_id(watch_url)
+        if not refresh:
+            cached = self.stream_cache.get(video_id)
+            if cached:
+                return cached
+        # Playback, prefetch, pre-roll and loudness analysis can ask for the same video at once (e.g. a skip
+        # while its prefetch runs): they share one extraction, cancelled only when all of them gave up.
+        # A background resolve still waiting for a slot moves up to the priority of the caller joining it.
+        self.extraction.scheduler.promote(video_id, current_priority())
+        return await self.resolves.run(video_id, lambda: self._resolve_stream(video_id, watch_url))
+
+    async def _resolve_stream(self, video_id: str, watch_url: str) -> str | None:
         try:
-            info = await loop.run_in_executor(self.executor, run)
-        except (DownloadError, ExtractorError) as e:
+            info = await self.extraction.run(extract_info, "single", watch_url, key=video_id)
+        except ExtractionError as e:
             error_msg = str(e)
             if "Sign in to confirm" in error_msg or "bot" in error_msg.lower():
                 self.logger.warning(f"YouTube bot verification required for {watch_url}")
@@ -610,98 +772,476 @@ class Music(commands.Cog):
             return None
         if not info:
             return None
+        duration = info.get("duration")
         # Try top-level url, else pick a format
         fmts = info.get("formats") or []
-        if info.get("url"):
-            return info["url"]
-        # fall back to any audio-only format
-        audio_only = [f for f in fmts if f.get(
-            "vcodec") == "none" and f.get("acodec") not in (None, "none")]
-        if audio_only:
-            best = max(audio_only, key=lambda f: (
-                f.get("abr") or 0, f.get("tbr") or 0))
-            return best.get("url")
-        return None
+        stream = info.get("url")
+        if not stream:
+            # fall back to any audio-only format
+            audio_only = [f for f in fmts if f.get(
+                "vcodec") == "none" and f.get("acodec") not in (None, "none")]
+            if audio_only:
+                best = max(audio_only, key=lambda f: (
+                    f.get("abr") or 0, f.get("tbr") or 0))
+                stream = best.get("url")
+                info = best
+        if stream:
+            self.stream_cache.put(video_id, stream, info.get("acodec"), duration)
+        return stream
+
+    @tasks.loop(minutes=2)
+    async def refresh_expiring_streams(self):
+        """Re-resolve the cached streams of upcoming tracks shortly before they expire."""
+        for player in list(self.players.values()):
+            set_priority(Priority.BACKGROUND, player.guild_id)
+            for entry in player.upcoming(settings.MUSIC_STREAM_REFRESH_LOOKAHEAD):
+                url = entry['song'].original_url
+                remaining = self.stream_cache.expires_in(_yt_video_id(url))
+                if remaining is not None and remaining < settings.MUSIC_STREAM_REFRESH_MARGIN:
+                    await self.resolve_stream(url, refresh=True)
+
+    @tasks.loop(seconds=settings.MUSIC_CHECKPOINT_INTERVAL)
+    async def checkpoint_sessions(self):
+        """Save the live sessions (queue, shuffle order, position) so a restart can resume them."""
+        loop = asyncio.get_event_loop()
+        for player in list(self.players.values()):
+            snapshot = self._session_snapshot(player)
+            if snapshot is None:
+                # Session over; but while shutting down the voice disconnect empties the queue, keep it then
+                if player.checkpoint_version is not None and not self.client.is_closed():
+                    await self._delete_checkpoint(player)
+                continue
+            session, entries, version = snapshot
+            async with self._checkpoint_lock:
+                if self.players.get(player.guild_id) is not player:
+                    continue  # disconnected meanwhile
+                if await loop.run_in_executor(self.executor, self.session_store.checkpoint, player.guild_id,
+                                              session, entries):
+                    player.checkpoint_version = version
+
+    @staticmethod
+    def _session_snapshot(player: GuildPlayer) -> tuple[dict, list[tuple] | None, int] | None:
+        """The session row, the queue's entry rows (None if unchanged since the last checkpoint) and its version.
+
+        None when the session is not playing anything in a voice channel.
+        """
+        current = player.queue.current
+        voice_client = player.voice_client
+        if current is None or voice_client is None or not voice_client.is_connected() \
+                or player.voice_channel is None:
+            return None
+        history, current_id, upcoming = player.queue.layout()
+        source = voice_client.source
+        session = {
+            'voice_channel_id': player.voice_channel.id if player.voice_channel else None,
+            'text_channel_id': player.text_channel_id,
+            'user_id': player.last_user.id if player.last_user else None,
+            'current': current_id,
+            'history': history,
+            'upcoming': upcoming,
+            'shuffled': player.queue.shuffled,
+            'playing': player.is_playing,
+            'position': round(source.position, 2) if isinstance(source, MeteredSource) else 0.0,
+        }
+        entries = None
+        if player.checkpoint_version != player.queue.version:
+            entries = [(entry['id'], entry['order'], *entry['song'].fields()) for entry in player.queue.entries()]
+        return session, entries, player.queue.version
+
+    async def _delete_checkpoint(self, player: GuildPlayer):
+        player.checkpoint_version = None
+        async with self._checkpoint_lock:
+            await asyncio.get_event_loop().run_in_executor(self.executor, self.session_store.delete,
+                                                           player.guild_id)
+
+    async def restore_sessions(self):
+        """Resume the sessions that were live when the bot stopped, once the guild cache is ready."""
+        await self.client.wait_until_ready()
+        sessions = await asyncio.get_event_loop().run_in_executor(self.executor, self.session_store.load)
+        for session, entries in sessions:
+            try:
+                await self._restore_session(session, entries)
+            except Exception as e:
+                self.logger.exception(f"Could not resume the music session of guild {session['guild_id']}: {e}")
+
+    async def _restore_session(self, session: dict, entries: list[dict]):
+        """Rebuild a saved queue as it was and continue the current track where it was.
 
-    async def prefetch_next_source(self):
-        """Resolve the next track's stream in advance to reduce start-up lag."""
-        if not self.exists_next_song_in_queue():
+        Songs keep their mapped YouTube URLs, so nothing is searched or mapped again;
+        only the stream URLs are resolved, when each track is about to play.
+        """
+        guild = self.client.get_guild(session['guild_id'])
+        voice_channel = guild.get_channel(session['voice_channel_id']) if guild else None
+        listeners = [member for member in voice_channel.members if not member.bot] if voice_channel else []
+        player = self.players.get(session['guild_id'])
+        if not listeners or session['age'] > settings.MUSIC_RESUME_MAX_AGE or player is not None:
+            # Nobody left to listen, too old, or a new session was started meanwhile. The saved rows
+            # belong to the old session (whose entry ids the new one reuses), so they all go
+            async with self._checkpoint_lock:
+                await asyncio.get_event_loop().run_in_executor(self.executor, self.session_store.delete,
+                                                               session['guild_id'])
+                if player is not None:
+                    player.checkpoint_version = None  # its next checkpoint writes every entry again
             return
-        try:
-            nxt = self._queue[self.queue_index + 1]['song']
-        except Exception:
+        player = self.get_player(guild)
+        player.voice_channel = voice_channel
+        player.queue.restore(entries, session['history'], session['current'], session['upcoming'],
+                             session['shuffled'])
+        current = player.get_current_from_queue()
+        if current is None:
+            await self.disconnect(player)
             return
-        if nxt.get('source'):
+        user = guild.get_member(session['user_id']) or self.client.user
+        self.logger.info(f"Resuming the music session of guild {guild.id}: {len(player.queue)} tracks, "
+                         f"{'playing' if session['playing'] else 'paused'} at {session['position']:.0f}s")
+        if session['playing']:
+            trace = self._begin_trace("resume", player)
+            if not await self.play_music(player, session['text_channel_id'], user, start=session['position']):
+                trace.finish("no audio")
             return
-        try:
-            src = await self.resolve_stream(nxt['original_url'])
-            if src:
-                nxt['source'] = src
-        except Exception as exc:
-            self.logger.warning("Prefetch failed for %s: %s",
-                                nxt.get('original_url'), exc)
+        # A paused session comes back paused, at the start of its track: /play continues it
+        player.text_channel_id = session['text_channel_id']
+        await self.join_voice_channel(player, session['text_channel_id'], voice_channel)
+        self.show_now_playing(player, user, current['song'], self.client.get_channel(session['text_channel_id']))
+        self.start_inactivity_timer(player, 5)
 
-    def play_audio(self, user, song):
-        def play_next_callback(e):
-            asyncio.run_coroutine_threadsafe(
-                self.play_next(user), self.client.loop)
+    def _begin_foreground(self):
+        self._foreground_jobs += 1
+        self._foreground_idle.clear()
+
+    def _end_foreground(self):
+        self._foreground_jobs -= 1
+        if self._foreground_jobs == 0:
+            self._foreground_idle.set()
+
+    def schedule_prefetch(self, player: GuildPlayer):
+        """Keep the next N tracks resolved, N adapting to how often this session skips.
+
+        Prefetches for tracks that left the window (moved, cleared, shuffled away) are cancelled.
+        """
+        size = player.prefetch_window(settings.MUSIC_PREFETCH_MIN, settings.MUSIC_PREFETCH_MAX)
+        wanted = {}
+        for entry in player.upcoming(size):
+            url = entry['song'].original_url
+            wanted[_yt_video_id(url)] = url
+        player.cancel_prefetch(keep=set(wanted))
+        for video_id, url in wanted.items():
+            if video_id in player.prefetch_tasks or self.stream_cache.expires_in(video_id) \
+                    or self.audio_cache.lookup(video_id):
+                continue
+            player.track_prefetch(video_id, player.spawn(self._prefetch_source(player, url)))
+
+    async def _prefetch_source(self, player: GuildPlayer, url: str):
+        """Resolve an upcoming track's stream into the stream cache at background priority."""
+        tracing.detach()
+        set_priority(Priority.BACKGROUND, player.guild_id)
+        await self._foreground_idle.wait()
+        async with self._prefetch_slots:
+            try:
+                if await self.resolve_stream(url):
+                    self.schedule_loudness(_yt_video_id(url))
+            except Exception as exc:
+                self.logger.warning("Prefetch failed for %s: %s", url, exc)
+
+    async def _track_gain(self, video_id: str) -> float | None:
+        """Precomputed gain of a track (dB), None until it has been analysed."""
+        if self.loudness.is_cached(video_id):
+            return self.loudness.cached(video_id)
+        return await asyncio.get_event_loop().run_in_executor(self.executor, self.loudness.lookup, video_id)
+
+    def schedule_loudness(self, video_id: str):
+        """Measure a track's loudness in the background unless it is known or being measured."""
+        if not video_id or video_id in self._loudness_jobs or self.loudness.cached(video_id) is not None:
+            return
+        task = self.client.loop.create_task(self._analyze_loudness(video_id))
+        self._loudness_jobs[video_id] = task
+        task.add_done_callback(lambda _: self._loudness_jobs.pop(video_id, None))
+
+    async def _analyze_loudness(self, video_id: str):
+        tracing.detach()
+        set_priority(Priority.BACKGROUND)
+        if await self._track_gain(video_id) is not None:
+            return
+        async with self._loudness_slots:
+            # One ffmpeg pass over the whole track: only while no /play or track start is waiting
+            await self._foreground_idle.wait()
+            local_path = self.audio_cache.lookup(video_id)
+            if local_path:
+                audio_input, before_options = local_path, None
+            else:
+                audio_input = await self.resolve_stream(_yt_watch_url(video_id))
+                before_options = ffmpeg_options['before_options']
+            if not audio_input:
+                return
+            try:
+                measured = await measure_loudness(audio_input, before_options, settings.MUSIC_LOUDNESS_TIMEOUT)
+            except (asyncio.TimeoutError, OSError) as e:
+                self.logger.warning(f"Loudness analysis failed for {video_id}: {e!r}")
+                return
+            if measured is None:
+                self.logger.warning(f"Loudness analysis gave no result for {video_id}")
+                return
+            integrated, true_peak = measured
+            gain = gain_for(integrated, true_peak, settings.MUSIC_LOUDNESS_TARGET,
+                            settings.MUSIC_LOUDNESS_MAX_PEAK, settings.MUSIC_LOUDNESS_MAX_BOOST)
+            await asyncio.get_event_loop().run_in_executor(
+                self.executor, self.loudness.store, video_id, integrated, true_peak, gain)
+            self.logger.info(f"Loudness of {video_id}: {integrated:.1f} LUFS, peak {true_peak:.1f} dBTP, "
+                             f"gain {gain:+.1f} dB")
+
+    async def _count_play(self, video_id: str, title: str | None):
+        """Count a play and store the track on disk once it has been played often enough."""
+        tracing.detach()
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(self.executor, self.audio_cache.record_play, video_id, title):
+            return
+        self.audio_cache.downloading.add(video_id)
+        try:
+            # Own pool: a download holding a background slot for minutes would stall playlist imports
+            path = await self.extraction.download(download_audio, "download", _yt_watch_url(video_id),
+                                                  timeout=settings.MUSIC_AUDIO_CACHE_DOWNLOAD_TIMEOUT)
+            if path:
+                await loop.run_in_executor(self.executor, self.audio_cache.add, video_id, path)
+                self.logger.info(f"Stored {video_id} in the audio cache")
+        except Exception as e:
+            self.logger.warning(f"Audio cache download failed for {video_id}: {e}")
+        finally:
+            self.audio_cache.downloading.discard(video_id)
+
+    def _record_stream_cpu(self, mode: str, seconds: float, bot_cpu: float, ffmpeg_cpu: float | None):
+        self.stream_cpu.record(mode, seconds, bot_cpu, ffmpeg_cpu)
+        if seconds:
+            ffmpeg_pct = f"{100 * ffmpeg_cpu / seconds:.1f}%" if ffmpeg_cpu is not None else "n/a"
+            self.logger.info(f"Stream CPU ({mode}, {seconds:.0f}s): bot {100 * bot_cpu / seconds:.1f}%, "
+                             f"ffmpeg {ffmpeg_pct}")
+
+    async def _create_audio_source(self, audio_input: str, audio_options: dict, codec: str | None,
+                                   track_gain: float | None = None) -> MeteredSource:
+        """Build the ffmpeg source for a track.
+
+        In ``opus`` mode Opus input is remuxed into Ogg packets that go to Discord
+        untouched (no decode, volume scaling or re-encode in the bot); other codecs
+        are encoded to Opus inside ffmpeg. ``pcm`` mode is the old decode-to-PCM path.
+        ``track_gain`` (dB, from the loudness analysis) is folded into the volume
+        in ``pcm`` mode. In ``opus`` mode it re-encodes the stream, so it is only
+        applied when at least ``MUSIC_LOUDNESS_MIN_ADJUST_DB``.
+        """
+        before_options = audio_options.get('before_options')
+        track_gain = track_gain or 0.0
+        if settings.MUSIC_PLAYBACK_MODE == 'opus':
+            if codec is None and os.path.exists(audio_input):
+                codec, _ = await discord.FFmpegOpusAudio.probe(audio_input)
+            if abs(track_gain) < settings.MUSIC_LOUDNESS_MIN_ADJUST_DB:
+                track_gain = 0.0
+            gain = round(settings.MUSIC_OPUS_GAIN_DB + track_gain, 2)
+            if codec == 'opus' and not gain:
+                ffmpeg = discord.FFmpegOpusAudio(audio_input, codec='opus', before_options=before_options,
+                                                 options='-vn')
+                return MeteredSource(ffmpeg, ffmpeg, 'opus-copy', self._record_stream_cpu)
+            options = f'-vn -af volume={gain}dB' if gain else '-vn'
+            ffmpeg = discord.FFmpegOpusAudio(audio_input, before_options=before_options, options=options)
+            return MeteredSource(ffmpeg, ffmpeg, 'opus-encode', self._record_stream_cpu)
+        ffmpeg = discord.FFmpegPCMAudio(audio_input, **audio_options)
+        volume = settings.MUSIC_VOLUME * 10 ** (track_gain / 20)
+        return MeteredSource(discord.PCMVolumeTransformer(ffmpeg, volume=volume), ffmpeg, 'pcm',
+                             self._record_stream_cpu)
+
+    async def _open_source(self, url: str, foreground: bool = False, start: float = 0.0) -> MeteredSource | None:
+        """Open a track's audio from the audio cache or its stream URL, ``start`` seconds in;
+        None if it cannot be resolved."""
+        video_id = _yt_video_id(url)
+        local_path = self.audio_cache.lookup(video_id)
+        if local_path:
+            audio_input, audio_options, codec = local_path, ffmpeg_local_options, None
+        else:
+            # The stream cache serves URLs resolved earlier until they expire
+            if foreground:
+                self._begin_foreground()
+            try:
+                with tracing.span("resolve"):
+                    source_url = await self.resolve_stream(url)
+            finally:
+                if foreground:
+                    self._end_foreground()
+            if not source_url:
+                return None
+            audio_input, audio_options = source_url, ffmpeg_options
+            codec = self.stream_cache.codec(video_id)
+        if start:
+            before_options = f"-ss {start:.2f} {audio_options.get('before_options', '')}".strip()
+            audio_options = {**audio_options, 'before_options': before_options}
+        gain = await self._track_gain(video_id)
+        with tracing.span("ffmpeg spawn"):
+            source = await self._create_audio_source(audio_input, audio_options, codec, gain)
+        source.offset = start
+        return source
+
+    def play_audio(self, player: GuildPlayer, user, song, start: float = 0.0):
+        player.last_user = user
+        trace = tracing.current.get()
+        if trace:
+            trace.handed_off = True
+
+        async def failed(outcome: str):
+            if trace:
+                trace.finish(outcome)
+            player.is_playing = False
+            await self.play_next(player, user, force=True)  # skip broken track
 
         async def play_audio_thread():
-            source_url = song['source']
-            if source_url is None:
-                source_url = await self.resolve_stream(song['original_url'])
-                if not source_url:
-                    self.logger.warning(
-                        "Could not resolve stream for %s", song['original_url'])
-                    self.is_playing = False
-                    await self.play_next(user, force=True)  # skip broken track
-                    return
-            # remember resolved URL so replays or requeues avoid re-fetching
-            song['source'] = source_url
+            set_priority(Priority.NEXT_TRACK, player.guild_id)
+            # Queue up resolves for the upcoming tracks; they wait until this one is resolved
+            self.schedule_prefetch(player)
+            entry = player.get_current_from_queue()
             try:
-                self.voice_client.play(discord.PCMVolumeTransformer(
-                    discord.FFmpegPCMAudio(source_url, **ffmpeg_options), volume=0.5
-                ), after=play_next_callback)
+                source = player.take_preroll(entry['id']) if entry and entry['song'] is song and not start else None
+                if source is None:
+                    source = await self._open_source(song.original_url, foreground=True, start=start)
             except Exception as exc:
                 self.logger.exception("Failed to start playback: %s", exc)
-                self.is_playing = False
-                await self.play_next(user, force=True)
+                await failed("failed")
+                return
+            if source is None and self.youtube.is_open:
+                # Every track would fail the same way: stop here instead of skipping through the queue
+                if trace:
+                    trace.finish("degraded")
+                player.is_playing = False
+                channel = self.client.get_channel(player.text_channel_id) if player.text_channel_id else None
+                if channel:
+                    notice = self._unavailable("⚠️ YouTube is limiting the bot right now ⚠️")
+                    await channel.send(f"{notice} Playback stopped, use /play to continue.")
+                return
+            if source is None:
+                self.logger.warning(
+                    "Could not resolve stream for %s", song.original_url)
+                await failed("no stream")
                 return
+            try:
+                self._start_playback(player, user, song, source, trace)
+            except Exception as exc:
+                self.logger.exception("Failed to start playback: %s", exc)
+                source.cleanup()
+                await failed("failed")
+
+        player.spawn(play_audio_thread())
+
+    def _start_playback(self, player: GuildPlayer, user, song: Track, source: MeteredSource,
+                        trace: tracing.Trace | None):
+        """Hand an opened source to the voice client and arrange the pre-roll of the track after it."""
+        def play_next_callback(e):
+            if player.skip_pending:
+                player.skip_pending = False
+            elif e is None:
+                player.record_transition(skipped=False)
+            self.client.loop.call_soon_threadsafe(self._on_track_end, player, user)
+
+        def on_first_frame():
+            self.client.loop.call_soon_threadsafe(self._first_packet, trace, time.monotonic() - started)
+
+        if trace:
+            source.on_first_frame = on_first_frame
+        started = time.monotonic()
+        player.voice_client.play(source, after=play_next_callback)
+        video_id = _yt_video_id(song.original_url)
+        self.suggestions.record(video_id, song.title)
+        self.client.loop.create_task(self._count_play(video_id, song.title))
+        self.schedule_loudness(video_id)  # for its next plays
+        duration = self.stream_cache.duration(video_id)
+        if duration:
+            player.spawn(self._preroll_next(player, source, duration))
+
+    async def _preroll_next(self, player: GuildPlayer, current: MeteredSource, duration: float):
+        """Open and buffer the next track's audio during the last seconds of ``current``."""
+        tracing.detach()
+        set_priority(Priority.NEXT_TRACK, player.guild_id)
+        lead = settings.MUSIC_PREROLL_SECONDS
+        # Position only moves while audio is played, so a pause just means one more round
+        while duration - current.position > lead:
+            await asyncio.sleep(duration - current.position - lead)
+        upcoming = player.upcoming(1)
+        if not upcoming or player.voice_client is None or player.voice_client.source is not current:
+            return
+        entry = upcoming[0]
+        try:
+            source = await self._open_source(entry['song'].original_url)
+        except Exception as exc:
+            self.logger.warning("Pre-roll failed for %s: %s", entry['song'].original_url, exc)
+            return
+        if source is None:
+            return
+        if player.voice_client is None or player.voice_client.source is not current:
+            source.cleanup()  # the track ended or was skipped meanwhile
+            return
+        source.preroll(int(settings.MUSIC_PREROLL_BUFFER_SECONDS / FRAME_SECONDS))
+        player.set_preroll(entry['id'], source)
 
-            # fire-and-forget prefetch of the upcoming track (if any)
-            self.client.loop.create_task(self.prefetch_next_source())
+    def _on_track_end(self, player: GuildPlayer, user):
+        """Called on the loop when a track stops: switch to the pre-rolled next track without awaiting anything.
 
-        self.client.loop.create_task(play_audio_thread())
+        Without a matching pre-roll (none yet, queue changed, paused) this falls back to ``play_next``.
+        """
+        upcoming = player.upcoming(1) if player.is_playing else []
+        source = player.take_preroll(upcoming[0]['id'] if upcoming else None)
+        if source is None or player.voice_client is None or not player.voice_client.is_connected():
+            if source:
+                source.cleanup()
+            player.spawn(self.play_next(player, user))
+            return
+        trace = self._begin_trace("transition", player)
+        trace.handed_off = True
+        song = player.queue.advance()['song']
+        try:
+            self._start_playback(player, user, song, source, trace)
+        except Exception as exc:
+            self.logger.exception("Failed to start pre-rolled playback: %s", exc)
+            source.cleanup()
+            trace.finish("failed")
+            player.spawn(self.play_next(player, user, force=True))
+            return
+        self.schedule_prefetch(player)
+        self.show_now_playing(player, user, song)
 
-    async def play_music(self, channel_id, user):
+    def _begin_trace(self, kind: str, player: GuildPlayer) -> tracing.Trace:
+        """Trace the running command or transition up to its first audio packet."""
+        def finished(trace: tracing.Trace):
+            self.trace_stats.record(trace)
+            player.trace_stats.record(trace)
+            self.logger.info(f"Trace (guild {trace.guild_id}) {trace.describe()}")
+
+        return tracing.begin(kind, player.guild_id, finished)
+
+    @staticmethod
+    def _first_packet(trace: tracing.Trace, seconds: float):
+        trace.add("first packet", seconds)
+        trace.finish()
+
+    async def play_music(self, player: GuildPlayer, channel_id, user, start: float = 0.0):
         """Plays a song
 
         Args:
+            player (GuildPlayer): Guild music session
             channel_id (_type_): Channel where to send messages to
             user (_type_): User who played the song
+            start (float): Position in the song to start from, in seconds
 
         Returns:
             _type_: _description_
         """
-        if self.queue_index < len(self._queue):
-            self.is_playing = True
+        if player.queue.current is None:
+            player.queue.advance()
+        entry = player.get_current_from_queue()
+        if entry:
+            player.is_playing = True
+            player.text_channel_id = channel_id
             channel = self.client.get_channel(channel_id)
-            await self.join_voice_channel(channel, self._queue[self.queue_index]['channel'])
-            song = self.get_current_song_from_queue()
-
-            if self.last_played_msg:
-                await self.last_played_msg.delete()
-
-            embed = create_playing_embed("▶️ Now playing", user, song)
-            msg = await channel.send(embed=embed, silent=True)
-            self.last_played_msg = msg
-            await add_reactions(msg)
+            await self.join_voice_channel(player, channel, player.voice_channel)
+            song = entry['song']
+            self.show_now_playing(player, user, song, channel)
 
-            self.play_audio(user, song)
+            self.play_audio(player, user, song, start)
             return True
         else:
-            self.queue_index += 1
-            self.is_playing = False
+            player.is_playing = False
             return False
 
     @app_commands.command(name='join', description="join vc")
@@ -713,7 +1253,7 @@ class Music(commands.Cog):
         """
         if itr.user.voice:
             user_channel = itr.user.voice.channel
-            await self.join_voice_channel(itr, user_channel)
+            await self.join_voice_channel(self.get_player(itr.guild), itr, user_channel)
             await itr.response.send_message(f'🎉 DouraBot has joined {user_channel} 🎉')
         else:
             await itr.response.send_message('⚠️ You need to be connected to a voice channel ⚠️')
@@ -725,34 +1265,20 @@ class Music(commands.Cog):
         Args:
             itr (discord.Interaction): Discord interaction
         """
-        if self.in_voice_channel():
-            await self.disconnect()
-            self.voice_client = None
+        player = self.players.get(itr.guild.id)
+        if player and player.in_voice_channel():
+            await self.disconnect(player)
             await itr.response.send_message('ℹ️ **DouraBot** has left the voice channel ℹ️')
         else:
             await itr.response.send_message('ℹ️ **DouraBot** is not in a voice channel ℹ️')
 
     async def _ydl_flat(self, url: str, playlist_items: str | None = None):
-        loop = asyncio.get_event_loop()
-
-        def run():
-            opts = {
-                **ytdl_format_options,
-                "extract_flat": "in_playlist",  # <-- the speedup
-                "noplaylist": False,
-                "skip_download": True,
-                "quiet": True,
-                "no_warnings": True,
-            }
-            if playlist_items:
-                opts["playlist_items"] = playlist_items  # e.g., "1" or "2-"
-            from yt_dlp import YoutubeDL
-            with YoutubeDL(opts) as yt:
-                return yt.extract_info(url, download=False)
-
+        overrides = {}
+        if playlist_items:
+            overrides["playlist_items"] = playlist_items  # e.g., "1" or "2-"
         try:
-            return await loop.run_in_executor(self.executor, run)
-        except (DownloadError, ExtractorError) as e:
+            return await self.extraction.run(extract_info, "flat", url, overrides)
+        except ExtractionError as e:
             error_msg = str(e)
             if "Sign in to confirm" in error_msg or "bot" in error_msg.lower():
                 self.logger.error(f"_ydl_flat: YouTube bot verification required for {url}")
@@ -763,70 +1289,64 @@ class Music(commands.Cog):
             self.logger.error(f"_ydl_flat error: {e}")
             return None
 
-    async def enqueue_playlist_progressive(self, playlist_url: str, user_channel,
+    async def enqueue_playlist_progressive(self, player: GuildPlayer, playlist_url: str,
                                            channel_to_notify: discord.abc.Messageable,
                                            shuffle_music: bool = False) -> int:
         """Enqueue first track now; fetch remaining items in the background."""
         # 1) Get only the first playlist entry (flat, instant)
         head = await self._ydl_flat(playlist_url, playlist_items="1")
         if not head or not head.get("entries"):
-            await channel_to_notify.send("❌ Could not read this playlist ❌")
+            await channel_to_notify.send(self._unavailable("❌ Could not read this playlist ❌"))
             return 0
 
-        first = head["entries"][0]
-        vid = first.get("id")
-        link = first.get("webpage_url") or first.get("url")
-        if not (link and link.startswith("http")):
-            link = _yt_watch_url(vid) if vid else playlist_url
-
-        first_song = {
-            "link": link,
-            "thumbnail": _pick_thumbnail(first) or _yt_thumb(vid or ""),
-            "original_url": link,
-            # resolve right before playback (your play_audio already does this)
-            "source": None,
-            "title": first.get("title"),
-        }
-        self._queue.append({"song": first_song, "channel": user_channel})
+        player.queue.append(_flat_track(head["entries"][0], playlist_url))
         added_count = 1
 
-        # 2) Background task: fetch the rest ("2-" means from 2 to end) and append
+        # 2) Background task: page through the rest (entries 2..max) of one lazy listing, queueing each page
+        # as it arrives. Clearing the queue or leaving cancels the task, which stops the listing after the
+        # page in flight.
         async def fetch_rest():
+            set_priority(Priority.BACKGROUND, player.guild_id)
+            limit = settings.MUSIC_PLAYLIST_MAX_ENTRIES
+            added = 0
+            failed = None
             try:
-                rest = await self._ydl_flat(playlist_url, playlist_items="2-")
-                entries = (rest or {}).get("entries") or []
-                items = []
-                for e in entries:
-                    if not e:
-                        continue
-                    vid2 = e.get("id")
-                    l2 = e.get("webpage_url") or e.get("url")
-                    if not (l2 and l2.startswith("http")):
-                        l2 = _yt_watch_url(vid2) if vid2 else playlist_url
-                    items.append({
-                        "link": l2,
-                        "thumbnail": _pick_thumbnail(e) or _yt_thumb(vid2 or ""),
-                        "original_url": l2,
-                        "source": None,  # resolve later
-                        "title": e.get("title"),
-                    })
-
-                if shuffle_music:
-                    from random import shuffle as _shuffle
-                    _shuffle(items)
-
-                # Extend queue on the event loop
-                for s in items:
-                    self._queue.append({"song": s, "channel": user_channel})
-
-                if items:
-                    await channel_to_notify.send(
-                        f"📜 Added +{len(items)} more from the playlist (total now {len(items) + 1}).")
+                async with aclosing(self.extraction.pages(list_playlist, "flat", playlist_url, 2, limit,
+                                                          settings.MUSIC_PLAYLIST_PAGE_SIZE)) as pages:
+                    async for entries in pages:
+                        if self.players.get(player.guild_id) is not player:
+                            return  # the session ended meanwhile
+                        items = [_flat_track(e, playlist_url) for e in entries]
+
+                        # Pages arrive in order, so a shuffled playlist is shuffled one page at a time
+                        if shuffle_music:
+                            shuffle(items)
+
+                        for s in items:
+                            player.queue.append(s)
+
+                        if items:
+                            added += len(items)
+                            self.schedule_prefetch(player)
+            except ExtractionError as ex:
+                failed = ex
+                self.logger.error(f"Playlist listing stopped after {added + 1} entries: {ex}")
             except Exception as ex:
+                failed = ex
                 self.logger.exception(
                     "Background playlist fetch failed: %s", ex)
 
-        self.client.loop.create_task(fetch_rest())
+            if self.players.get(player.guild_id) is not player:
+                return
+            if failed is not None:
+                await channel_to_notify.send(self._unavailable(
+                    f"⚠️ Could not read the rest of the playlist, queued {added + 1} of its tracks ⚠️"))
+            elif added:
+                capped = " (playlist capped)" if added + 1 >= limit else ""
+                await channel_to_notify.send(
+                    f"📜 Added +{added} more from the playlist (total now {added + 1}){capped}.")
+
+        player.spawn(fetch_rest(), background=True)
         return added_count
 
     async def search_youtube(self, q: str):
@@ -834,14 +1354,15 @@ class Music(commands.Cog):
             return [q]
         loop = asyncio.get_event_loop()
 
-        def run():
-            from yt_dlp import YoutubeDL
-            with YoutubeDL({"quiet": True, "noplaylist": True}) as yt:
-                return yt.extract_info(f"ytsearch1:{q}", download=False)
+        # Repeat searches (e.g. the same Spotify playlist queued again) are served from the DB
+        mapped = await loop.run_in_executor(self.executor, self.query_store.lookup, q)
+        if mapped:
+            self.suggestions.record(mapped[0], mapped[1], q)
+            return [_yt_watch_url(mapped[0])]
 
         try:
-            info = await loop.run_in_executor(self.executor, run)
-        except (DownloadError, ExtractorError) as e:
+            info = await self.extraction.run(extract_info, "search", f"ytsearch1:{q}")
+        except ExtractionError as e:
             error_msg = str(e)
             if "Sign in to confirm" in error_msg or "bot" in error_msg.lower():
                 self.logger.error(f"search_youtube: YouTube bot verification required for query '{q}'")
@@ -852,23 +1373,20 @@ class Music(commands.Cog):
             self.logger.error(f"search_youtube error: {e}")
             return []
         e = (info.get("entries") or [None])[0] if info else None
-        return [e.get("webpage_url")] if e else []
+        if not e:
+            return []
+        if e.get("id"):
+            await loop.run_in_executor(self.executor, self.query_store.store, q, e["id"], e.get("title"))
+            self.suggestions.record(e["id"], e.get("title"), q)
+        return [e.get("webpage_url")]
 
     async def extract_youtube(self, url: str):
-        loop = asyncio.get_event_loop()
-
-        def run_fast_or_single():
-            # Treat pure playlist URLs as playlists; watch URLs stay single
-            is_playlist = ("playlist?list=" in url) or (
-                "list=" in url and "watch?v=" not in url)
-            opts = FAST_PLAYLIST_OPTS if is_playlist else SINGLE_OPTS
-            from yt_dlp import YoutubeDL
-            with YoutubeDL(opts) as yt:
-                return yt.extract_info(url, download=False)
-
+        # Treat pure playlist URLs as playlists; watch URLs stay single
+        is_playlist = ("playlist?list=" in url) or (
+            "list=" in url and "watch?v=" not in url)
         try:
-            info = await loop.run_in_executor(self.executor, run_fast_or_single)
-        except (DownloadError, ExtractorError) as e:
+            info = await self.extraction.run(extract_info, "playlist" if is_playlist else "single", url)
+        except ExtractionError as e:
             error_msg = str(e)
             if "Sign in to confirm" in error_msg or "bot" in error_msg.lower():
                 self.logger.error(f"extract_youtube: YouTube bot verification required for {url}")
@@ -883,24 +1401,7 @@ class Music(commands.Cog):
 
         # Playlist: flat entries — super fast; defer stream resolution
         if "entries" in info or info.get("_type") == "playlist":
-            items = []
-            for e in info.get("entries") or []:
-                if not e:
-                    continue
-                # Flat entries may give id/ie_key; build a stable watch URL
-                page_url = e.get("webpage_url") or e.get("url")
-                if page_url and page_url.startswith("http"):
-                    link = page_url
-                else:
-                    vid = e.get("id") or page_url
-                    link = f"https://www.youtube.com/watch?v={vid}"
-                items.append({
-                    "link": link,
-                    "thumbnail": _pick_thumbnail(e),
-                    "original_url": link,
-                    "source": None,  # resolve later (right before play)
-                    "title": e.get("title"),
-                })
+            items = [_flat_track(e, url) for e in info.get("entries") or [] if e]
             return items or None
 
         # Single video: resolve a playable URL now
@@ -908,12 +1409,7 @@ class Music(commands.Cog):
         stream = v.get("url") or _pick_best_stream(v)
         if not stream:
             # fallback: try "best"
-            def run_best():
-                from yt_dlp import YoutubeDL
-                with YoutubeDL({**SINGLE_OPTS, "format": "best"}) as yt:
-                    return yt.extract_info(v.get("webpage_url") or url, download=False)
-
-            alt = await loop.run_in_executor(self.executor, run_best)
+            alt = await self.extraction.run(extract_info, "best", v.get("webpage_url") or url)
             if alt:
                 stream = alt.get("url") or _pick_best_stream(alt)
                 if stream:
@@ -921,14 +1417,12 @@ class Music(commands.Cog):
         if not stream:
             self.logger.warning("No playable stream found")
             return None
+        if v.get("id"):
+            self.stream_cache.put(v["id"], stream, v.get("acodec") if v.get("url") == stream else None,
+                                  v.get("duration"))
 
-        return [{
-            "link": v.get("webpage_url") or url,
-            "thumbnail": _pick_thumbnail(v),
-            "original_url": v.get("original_url") or v.get("webpage_url") or url,
-            "source": stream,
-            "title": v.get("title"),
-        }]
+        return [Track(v.get("id"), v.get("title"), source=stream, url=v.get("webpage_url") or url,
+                      thumbnail=_pick_thumbnail(v))]
 
     @app_commands.command(name='play', description="play a song or playlist")
     async def play(self, itr: discord.Interaction, search: str = None, shuffle_music: bool = False):
@@ -937,71 +1431,69 @@ class Music(commands.Cog):
         """
         await itr.response.defer()
         channel = itr.channel
+        player = self.get_player(itr.guild)
         self.logger.info(f'User {itr.user.display_name} called play/{search}')
 
+        trace = self._begin_trace("play", player)
+        set_priority(Priority.INTERACTIVE, player.guild_id)
+        self._begin_foreground()
         try:
             # must check BEFORE using itr.user.voice.channel
             if not itr.user.voice:
                 await itr.followup.send('⚠️ You need to be connected to a voice channel ⚠️')
                 return
-            user_channel = itr.user.voice.channel
+            player.voice_channel = itr.user.voice.channel
 
             # No search: (re)play from queue or resume
             if search is None:
-                if self.is_queue_empty():
+                if player.is_queue_empty():
                     await itr.followup.send('❌ There are no songs to be played in the queue ❌')
                     return
-                if not self.is_playing:
-                    played = await self.play_music(itr.channel.id, itr.user)
+                if not player.is_playing:
+                    played = await self.play_music(player, itr.channel.id, itr.user)
                     if not played:
                         await itr.followup.send('❌ There are no songs to be played in the queue ❌')
                 else:
-                    self.is_playing = True
-                    self.voice_client.resume()
+                    player.is_playing = True
+                    player.voice_client.resume()
                 return
 
             # We have a search / URL
-            song_info: list[dict] = []
+            song_info: list[Track] = []
             already_enqueued_first = False
 
             # ---- Spotify (playlist/album progressive)
-            if is_spotify_playlist(search) or is_spotify_album(search):
+            if is_spotify_url(search) and (is_spotify_playlist(search) or is_spotify_album(search)):
                 self.logger.info(f'Spotify URL found: {search}')
-                added_now = await self.enqueue_spotify_playlist_progressive(
-                    search, user_channel, channel, shuffle_music
-                )
+                with tracing.span("playlist head"):
+                    added_now = await self.enqueue_spotify_playlist_progressive(
+                        player, search, channel, shuffle_music
+                    )
                 if added_now == 0:
-                    await itr.followup.send('❌ Could not read this Spotify URL ❌')
+                    await itr.followup.send(self._unavailable('❌ Could not read this Spotify URL ❌'))
                     return
                 # First track was already enqueued by the progressive method
-                song_info = [self._queue[-1]['song']]
+                song_info = [player.queue.last()['song']]
                 already_enqueued_first = True
 
             # ---- Spotify single track (map to YouTube)
             elif is_spotify_url(search):
-                query = get_spotify_track_info(search)  # "Title Artist"
-                yt_urls = await self.search_youtube(query)
-                if not yt_urls:
-                    msg = await itr.followup.send('❌ Could not find the song ❌')
+                track = _spotify_track(await self._sp_call(lambda: self.spotify.track(search)))
+                await self._known_tracks([track])
+                song = await self._map_spotify_track(track)
+                if not song:
+                    msg = await itr.followup.send(self._unavailable('❌ Could not find the song ❌'))
                     await delete_message(msg)
                     return
-                url0 = yt_urls[0]
-                vid0 = url0.split(
-                    "v=")[-1].split("&")[0] if "v=" in url0 else url0.rsplit("/", 1)[-1]
-                song_info = [{
-                    "link": url0,
-                    "thumbnail": _yt_thumb(vid0),
-                    "original_url": url0,
-                    "source": None,  # resolve just-in-time at play
-                    "title": query,
-                }]
+                song_info = [song]
 
             else:
                 # ---- YouTube: search or URL
-                search_results = await self.search_youtube(search)
+                with tracing.span("search"):
+                    search_results = await self.search_youtube(search)
                 self.logger.info(f'Youtube Search results: {search_results}')
                 if not search_results:
-                    msg = await itr.followup.send('❌ Could not find the song ❌')
+                    msg = await itr.followup.send(self._unavailable('❌ Could not find the song ❌'))
                     await delete_message(msg)
                     return
 
@@ -1009,20 +1501,22 @@ class Music(commands.Cog):
 
                 # YouTube playlist → progressive
                 if _is_playlist_url(yt_url):
-                    added_now = await self.enqueue_playlist_progressive(
-                        yt_url, user_channel, channel, shuffle_music
-                    )
+                    with tracing.span("playlist head"):
+                        added_now = await self.enqueue_playlist_progressive(
+                            player, yt_url, channel, shuffle_music
+                        )
                     if added_now == 0:
-                        await itr.followup.send('❌ Could not read this playlist ❌')
+                        await itr.followup.send(self._unavailable('❌ Could not read this playlist ❌'))
                         return
-                    song_info = [self._queue[-1]['song']]
+                    song_info = [player.queue.last()['song']]
                     already_enqueued_first = True
 
                 # Single YouTube video → extract now
                 else:
-                    song_info = await self.extract_youtube(yt_url)
+                    with tracing.span("extract"):
+                        song_info = await self.extract_youtube(yt_url)
                     if not song_info:
-                        await itr.followup.send('❌ Could not play the song ❌')
+                        await itr.followup.send(self._unavailable('❌ Could not play the song ❌'))
                         return
 
             # ---- Add to queue (avoid double-add for progressive branches)
@@ -1032,28 +1526,24 @@ class Music(commands.Cog):
 
             if not already_enqueued_first:
                 for s in song_info:
-                    self._queue.append({'song': s, 'channel': user_channel})
+                    player.queue.append(s)
 
-            await channel.send(f'📜 Added {len(song_info)} song{"s" if len(song_info) != 1 else ""} to the queue 📜')
+            # ---- Start playback if idle; messages go out afterwards so they never delay the audio
+            start = not player.is_playing and not (player.voice_client and player.voice_client.is_paused())
+            played = start and await self.play_music(player, itr.channel.id, itr.user)
 
-            # ---- Start playback if idle
-            if not self.is_playing:
-                if self.voice_client and self.voice_client.is_paused():
+            with tracing.span("messages"):
+                await channel.send(f'📜 Added {len(song_info)} song{"s" if len(song_info) != 1 else ""} to the queue 📜')
+                if played:
+                    msg = await itr.followup.send("▶️ Connected and playing...")
+                elif start:
+                    await itr.followup.send('❌ There are no songs to be played in the queue ❌')
+                    return
+                else:
                     embed = create_playing_embed(
                         "📜 Added to queue 📜", itr.user, song_info)
-                    msg2 = await itr.followup.send(embed=embed, silent=True)
-                    await delete_message(msg2)
-                else:
-                    tmp_msg = await itr.followup.send("▶️ Connected and playing...")
-                    await delete_message(tmp_msg)
-                    played = await self.play_music(itr.channel.id, itr.user)
-                    if not played:
-                        await itr.followup.send('❌ There are no songs to be played in the queue ❌')
-            else:
-                embed = create_playing_embed(
-                    "📜 Added to queue 📜", itr.user, song_info)
-                msg2 = await itr.followup.send(embed=embed, silent=True)
-                await delete_message(msg2)
+                    msg = await itr.followup.send(embed=embed, silent=True)
+            self.client.loop.create_task(delete_message(msg))
 
         except Exception as e:
             self.logger.exception(f"Error in play command: {e}")
@@ -1061,37 +1551,55 @@ class Music(commands.Cog):
                 await itr.followup.send('❌ An error occurred while processing your request. Please try again later. ❌', ephemeral=True)
             except Exception:
                 self.logger.error("Could not send error message to user")
-
-    def _queue_embed(self, page: int, page_size: int) -> discord.Embed:
+        finally:
+            self._end_foreground()
+            if not trace.handed_off:
+                trace.finish("no audio")
+
+    @play.autocomplete('search')
+    async def play_search_autocomplete(self, itr: discord.Interaction,
+                                       current: str) -> list[app_commands.Choice[str]]:
+        """Suggest known tracks from the local index; never searches YouTube, so it answers within the deadline."""
+        if is_spotify_url(current) or "youtube.com/" in current or "youtu.be/" in current:
+            return []
+        # The session's latest queue entries are offered too, after the indexed tracks
+        recent = {}
+        player = self.players.get(itr.guild.id) if itr.guild else None
+        if player:
+            for entry in islice(reversed(player.queue.entries()), settings.MUSIC_SUGGESTIONS_QUEUE_ENTRIES):
+                recent.setdefault(_yt_video_id(entry['song'].original_url), entry['song'].title)
+        return [app_commands.Choice(name=title[:100], value=_yt_watch_url(video_id))
+                for video_id, title in self.suggestions.search(current, 25, recent)]
+
+    def _queue_embed(self, player: GuildPlayer, page: int, page_size: int) -> discord.Embed:
         """Build a paginated queue embed with current/previous headers."""
         embed = discord.Embed(title="🎚️ Music queue 🎚️")
 
-        previous = self.get_previous_song()
-        current = self.get_current_song_from_queue()
+        previous = player.get_previous_song()
+        current = player.get_current_song_from_queue()
 
         if previous is not None:
             embed.add_field(
                 name="PREVIOUS",
-                value=f'[{previous["title"]}]({previous["link"]})',
+                value=f'[{previous.title}]({previous.link})',
                 inline=False)
 
         embed.add_field(
             name="CURRENT",
-            value=f'[{current["title"]}]({current["link"]})',
+            value=f'[{current.title}]({current.link})' if current else "(nothing playing)",
             inline=False)
 
-        upcoming = self._queue[self.queue_index + 1:]
-        total_upcoming = len(upcoming)
+        total_upcoming = player.queue.upcoming_count()
         total_pages = max(1, (total_upcoming + page_size - 1) // page_size)
         page = max(0, min(page, total_pages - 1))
         start = page * page_size
-        end = start + page_size
-        slice_items = upcoming[start:end]
+        slice_items = player.queue.upcoming(page_size, start)
 
         if slice_items:
+            # Entry ids stay the same while the queue grows; skip_to/move_song take them
             song_list = [
-                f'{self.queue_index + 1 + start + i}. [{entry["song"]["title"]}]({entry["song"]["link"]})'
-                for i, entry in enumerate(slice_items)
+                f'{entry["id"]}. [{entry["song"].title}]({entry["song"].link})'
+                for entry in slice_items
             ]
             songs_text = "\n".join(song_list)
         else:
@@ -1104,9 +1612,10 @@ class Music(commands.Cog):
         return embed
 
     class QueueView(discord.ui.View):
-        def __init__(self, cog: "Music", user: discord.User, page_size: int = 8):
+        def __init__(self, cog: "Music", player: GuildPlayer, user: discord.User, page_size: int = 8):
             super().__init__(timeout=120)
             self.cog = cog
+            self.player = player
             self.user = user
             self.page_size = page_size
             self.page = 0
@@ -1115,7 +1624,7 @@ class Music(commands.Cog):
 
         def update_buttons(self):
             """Update button states based on current page."""
-            total_upcoming = len(self.cog._queue) - (self.cog.queue_index + 1)
+            total_upcoming = self.player.queue.upcoming_count()
             self.total_pages = max(
                 1, (total_upcoming + self.page_size - 1) // self.page_size)
             self.children[0].disabled = (self.page == 0)  # Prev
@@ -1123,13 +1632,13 @@ class Music(commands.Cog):
                 self.page == self.total_pages - 1)  # Next
 
         async def update(self, interaction: discord.Interaction):
-            total_upcoming = len(self.cog._queue) - (self.cog.queue_index + 1)
+            total_upcoming = self.player.queue.upcoming_count()
             total_pages = max(
                 1, (total_upcoming + self.page_size - 1) // self.page_size)
             self.page = max(0, min(self.page, total_pages - 1))
             self.total_pages = total_pages
             self.update_buttons()
-            embed = self.cog._queue_embed(self.page, self.page_size)
+            embed = self.cog._queue_embed(self.player, self.page, self.page_size)
             await interaction.response.edit_message(embed=embed, view=self)
 
         @discord.ui.button(label="Prev", style=discord.ButtonStyle.secondary)
@@ -1157,13 +1666,14 @@ class Music(commands.Cog):
     async def queue(self, itr: discord.Interaction):
         """Display the current queue with pagination."""
         await itr.response.defer()
+        player = self.get_player(itr.guild)
 
-        if self.is_queue_empty():
+        if player.is_queue_empty():
             await itr.followup.send('ℹ️ There are no songs in the queue ℹ️', silent=True)
             return
 
-        view = self.QueueView(self, itr.user)
-        embed = self._queue_embed(page=0, page_size=view.page_size)
+        view = self.QueueView(self, player, itr.user)
+        embed = self._queue_embed(player, page=0, page_size=view.page_size)
         view.update_buttons()
         await itr.followup.send(embed=embed, view=view, silent=True)
 
@@ -1175,7 +1685,12 @@ class Music(commands.Cog):
             itr (discord.Interaction): Discord interaction
         """
         await itr.response.defer()
-        self.clear_queue_impl()
+        player = self.get_player(itr.guild)
+        # Stop playlist fetches (and their pending extraction jobs) from refilling the queue
+        player.cancel_background()
+        if not player.is_queue_empty():
+            player.clear_queue_impl()
+        self.schedule_prefetch(player)
         msg = await itr.followup.send('🗑️ Queue cleared! 🗑️', silent=True)
         await delete_message(msg)
 
@@ -1185,36 +1700,38 @@ class Music(commands.Cog):
 
         Args:
             itr (discord.Interaction): Discord interaction
-            index (int): The queue index to skip to (0-based, as shown in queue)
+            index (int): The number of the song, as shown in the queue
         """
         await itr.response.defer()
+        player = self.get_player(itr.guild)
 
-        if not self.voice_client:
+        if not player.voice_client:
             await itr.followup.send("❌ Not connected to a voice channel ❌")
             return
 
-        if self.is_queue_empty():
+        if player.is_queue_empty():
             await itr.followup.send("❌ The queue is empty ❌")
             return
 
-        # Validate index (0-based as shown in the queue)
-        if index < 0 or index >= len(self._queue):
-            await itr.followup.send(f"❌ Invalid index. Must be between 0 and {len(self._queue) - 1} ❌")
+        current = player.get_current_from_queue()
+        if current and index == current['id']:
+            await itr.followup.send("ℹ️ That song is already playing ℹ️")
             return
 
-        if index == self.queue_index:
-            await itr.followup.send("ℹ️ That song is already playing ℹ️")
+        # Make the song the next one; tracks appended meanwhile do not change its number
+        if not player.queue.skip_to(index):
+            await itr.followup.send(f"❌ There is no song #{index} in the queue ❌")
             return
 
-        # Jump to the specified index
-        self.queue_index = index - 1
-        if self.voice_client.is_playing() or self.voice_client.is_paused():
-            # Stop triggers play_next callback which will increment queue_index and play
-            self.voice_client.stop()
+        player.record_transition(skipped=True)
+        if player.voice_client.is_playing() or player.voice_client.is_paused():
+            # Stop triggers play_next callback which will advance to it and play
+            player.skip_pending = True
+            player.voice_client.stop()
         else:
-            # Not currently playing, manually start at target index
-            self.queue_index = index
-            await self.play_music(itr.channel.id, itr.user)
+            # Not currently playing, manually start the target song
+            player.queue.advance()
+            await self.play_music(player, itr.channel.id, itr.user)
 
         msg = await itr.followup.send(f'⏭️ Skipped to song #{index}')
         await delete_message(msg)
@@ -1225,52 +1742,87 @@ class Music(commands.Cog):
 
         Args:
             itr (discord.Interaction): Discord interaction
-            from_index (int): The current position of the song (0-based, as shown in queue)
-            to_index (int): The desired position for the song (0-based, as shown in queue)
+            from_index (int): The number of the song to move, as shown in the queue
+            to_index (int): The number of the song whose place it takes, as shown in the queue
         """
         await itr.response.defer()
+        player = self.get_player(itr.guild)
 
-        if not self.voice_client:
+        if not player.voice_client:
             await itr.followup.send("❌ Not connected to a voice channel ❌")
             return
 
-        if self.is_queue_empty():
+        if player.is_queue_empty():
             await itr.followup.send("❌ The queue is empty ❌")
             return
 
-        # Validate indices (0-based as shown in the queue)
-        if from_index < 0 or from_index >= len(self._queue):
-            await itr.followup.send(f"❌ Invalid source index. Must be between 0 and {len(self._queue) - 1} ❌")
-            return
-
-        if to_index < 0 or to_index >= len(self._queue):
-            await itr.followup.send(f"❌ Invalid destination index. Must be between 0 and {len(self._queue) - 1} ❌")
-            return
-
         if from_index == to_index:
             await itr.followup.send("ℹ️ Source and destination indices are the same ℹ️")
             return
 
         # Cannot move the currently playing song
-        if from_index == self.queue_index:
+        current = player.get_current_from_queue()
+        if current and from_index == current['id']:
             await itr.followup.send("❌ Cannot move the currently playing song ❌")
             return
 
         # Move the song
-        song = self._queue.pop(from_index)
-        self._queue.insert(to_index, song)
-
-        # Adjust queue_index if necessary
-        if from_index < self.queue_index < to_index:
-            self.queue_index -= 1
-        elif to_index <= self.queue_index < from_index:
-            self.queue_index += 1
+        if not player.queue.move(from_index, to_index):
+            await itr.followup.send("❌ Both songs must be in the upcoming queue ❌")
+            return
+        self.schedule_prefetch(player)
 
-        song_title = song['song'][0]['title'] if isinstance(
-            song['song'], list) else song['song']['title']
+        song_title = player.queue.get(from_index)['song'].title
         msg = await itr.followup.send(f'🔄 Moved "{song_title}" from position {from_index} to {to_index}')
         await delete_message(msg)
 
+    @app_commands.command(name='music_stats', description="show time-to-first-audio percentiles")
+    @is_role_allowed(settings.ROLES['DOURADINHO_GOD'], settings.ROLES['DEV'])
+    async def music_stats(self, itr: discord.Interaction):
+        """Shows rolling time-to-first-audio percentiles per span, overall and for this server's session"""
+        self.logger.info(f'User {itr.user.display_name} called music_stats')
+        sections = ["############## ALL SESSIONS ##############\n"
+                    + (_format_percentiles(self.trace_stats) or "No traces yet")]
+        player = self.players.get(itr.guild.id)
+        if player:
+            sections.append("############## THIS SESSION ##############\n"
+                            + (_format_percentiles(player.trace_stats) or "No traces yet"))
+        message = f"Stream resolves: {self.resolves.started} started, {self.resolves.shared} shared\n"
+        queries = self.query_store.stats()
+        message += (f"Search cache: {queries['hits']} hits, {queries['misses']} misses, {queries['stale']} stale "
+                    f"({queries['hit_rate']:.0%} hit rate)\n")
+        index = self.track_index.stats()
+        message += (f"Spotify track index: {index['hits']} hits, {index['misses']} misses "
+                    f"({index['hit_rate']:.0%} hit rate)\n")
+        message += (f"YouTube: {self.youtube.status()}, {self.youtube.total_trips} trips, "
+                    f"{self.youtube.refused} requests refused\n")
+        message += _format_scheduler(self.extraction.scheduler) + "\n"
+        for mode, cpu in self.stream_cpu.summary().items():
+            message += (f"Stream CPU {mode}: {cpu['streams']} streams, {cpu['audio_seconds'] / 60:.0f} min, "
+                        f"bot {cpu['bot_cpu_pct']:.1f}%, ffmpeg {cpu['ffmpeg_cpu_pct']:.1f}%"
+                        f" ({cpu['ffmpeg_unmeasured']} unmeasured)\n")
+        ytdl = self.extraction.ytdl_stats()
+        message += (f"YoutubeDL: {ytdl['created']} built (avg {ytdl['avg_build_seconds'] * 1000:.0f} ms), "
+                    f"{ytdl['reused']} reused, {ytdl['recycled']} recycled, "
+                    f"~{ytdl['build_seconds_saved']:.1f}s of construction saved "
+                    f"({ytdl['processes']} process{'es' if ytdl['processes'] != 1 else ''})")
+        sections.append(message)
+        # Discord rejects messages over 2000 characters; the tables alone can pass that
+        first, *rest = _code_blocks(sections)
+        await itr.response.send_message(first, ephemeral=True)
+        for message in rest:
+            await itr.followup.send(message, ephemeral=True)
+
+    @music_stats.error
+    async def music_stats_error(self, itr: discord.Interaction, error):
+        if isinstance(error, app_commands.CheckFailure):
+            self.logger.info(
+                f'User {itr.user.display_name} tried calling music_stats')
+            await itr.response.send_message('Not allowed!', ephemeral=True)
+        else:
+            self.logger.error(f'Error in music_stats: {error}')
+            await itr.response.send_message('An error occurred!', ephemeral=True)
+
 
 async def setup(client: commands.Bot) -> None:
     await client.add_cog(Music(client))
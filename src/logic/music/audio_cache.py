@@ -0,0 +1,138 @@
+import os
+import threading
+
+import mysql.connector
+
+from database import DatabaseManager
+from settings import get_logger
+
+logger = get_logger()
+
+
+def record_track_play(video_id: str, title: str | None = None):
+    """Count a play (keeping the track's last known title) and return (play_count, file_path) for the track."""
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO MUSIC_AUDIO_CACHE (VIDEO_ID, TITLE, PLAY_COUNT, LAST_PLAYED_AT) VALUES (%s, %s, 1, NOW())
+            ON DUPLICATE KEY UPDATE PLAY_COUNT = PLAY_COUNT + 1, LAST_PLAYED_AT = NOW(),
+                TITLE = COALESCE(VALUES(TITLE), TITLE)
+            """, (video_id, title[:500] if title else None))
+        conn.commit()
+        cursor.execute(
+            "SELECT PLAY_COUNT, FILE_PATH FROM MUSIC_AUDIO_CACHE WHERE VIDEO_ID = %s", (video_id,))
+        return cursor.fetchone()
+
+
+def set_cached_file(video_id: str, file_path: str | None, size_bytes: int) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE MUSIC_AUDIO_CACHE SET FILE_PATH = %s, SIZE_BYTES = %s,
+                CACHED_AT = IF(%s IS NULL, NULL, NOW())
+            WHERE VIDEO_ID = %s
+            """, (file_path, size_bytes, file_path, video_id))
+        conn.commit()
+
+
+def get_cached_files():
+    """Stored files, least recently played first."""
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT VIDEO_ID, FILE_PATH, SIZE_BYTES FROM MUSIC_AUDIO_CACHE
+            WHERE FILE_PATH IS NOT NULL ORDER BY LAST_PLAYED_AT ASC
+            """)
+        return cursor.fetchall()
+
+
+class AudioCache:
+    """Disk cache of audio for frequently played tracks.
+
+    The DB (MUSIC_AUDIO_CACHE) counts plays and indexes stored files; an
+    in-memory copy of the index answers lookups on the playback path.
+    Files are evicted least-recently-played first once ``max_bytes`` is exceeded.
+    Blocking methods are meant to run in an executor.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, min_plays: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self._files: dict[str, tuple[str, int]] = {}  # video id -> (path, size), LRU order
+        self._lock = threading.Lock()
+        self.downloading: set[str] = set()
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            rows = get_cached_files()
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not load audio cache index: {e}')
+            return
+        for video_id, path, size in rows:
+            if os.path.exists(path):
+                with self._lock:
+                    self._files[video_id] = (path, size)
+            else:
+                self._forget(video_id)
+        logger.info(f'Audio cache: {len(self._files)} tracks, {self.total_bytes() // (1024 * 1024)} MB')
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(size for _, size in self._files.values())
+
+    def lookup(self, video_id: str) -> str | None:
+        with self._lock:
+            entry = self._files.pop(video_id, None)
+            if entry is None or not os.path.exists(entry[0]):
+                return None
+            # re-insert at the end to refresh its LRU position
+            self._files[video_id] = entry
+            return entry[0]
+
+    def record_play(self, video_id: str, title: str | None = None) -> bool:
+        """Count a play; return True when the track just became worth storing on disk."""
+        try:
+            play_count, file_path = record_track_play(video_id, title)
+        except (mysql.connector.Error, ValueError, TypeError) as e:
+            logger.warning(f'Could not record play for {video_id}: {e}')
+            return False
+        return file_path is None and play_count >= self.min_plays and video_id not in self.downloading
+
+    def add(self, video_id: str, path: str):
+        size = os.path.getsize(path)
+        with self._lock:
+            self._files[video_id] = (path, size)
+        try:
+            set_cached_file(video_id, path, size)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not index cached audio for {video_id}: {e}')
+        self.evict()
+
+    def evict(self):
+        evicted = []
+        with self._lock:
+            total = sum(size for _, size in self._files.values())
+            for video_id in list(self._files):
+                if total <= self.max_bytes:
+                    break
+                path, size = self._files.pop(video_id)
+                total -= size
+                evicted.append((video_id, path))
+        for video_id, path in evicted:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._forget(video_id)
+
+    @staticmethod
+    def _forget(video_id: str):
+        try:
+            set_cached_file(video_id, None, 0)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not drop cached audio for {video_id}: {e}')
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import discord
+
+from settings import get_logger
+
+logger = get_logger()
+
+
+class NowPlayingController:
+    """The single now-playing message of a session, edited in place.
+
+    ``update`` only records the wanted state; one task applies it, at most one
+    edit per ``interval`` seconds, so bursts (skip spam, pause + shuffle) are
+    coalesced into a single REST call. The message is re-sent only when it is
+    gone or the session moved to another text channel.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.message: discord.Message | None = None
+        self.channel: discord.abc.Messageable | None = None
+        self.edits = 0
+        self.coalesced = 0
+        self._pending: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._last_edit = 0.0
+
+    def update(self, channel: discord.abc.Messageable | None = None, embed: discord.Embed | None = None,
+               view: discord.ui.View | None = None):
+        """Schedule an edit; fields left as None keep their pending or current value."""
+        if self._pending is None:
+            self._pending = {}
+        else:
+            self.coalesced += 1
+        for key, value in (('channel', channel), ('embed', embed), ('view', view)):
+            if value is not None:
+                self._pending[key] = value
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending is not None:
+            wait = self._last_edit + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            pending, self._pending = self._pending, None
+            self._last_edit = time.monotonic()
+            try:
+                await self._apply(**pending)
+            except discord.HTTPException as e:
+                logger.warning(f'Could not update the now-playing message: {e}')
+
+    async def _apply(self, channel=None, embed=None, view=None):
+        if channel is not None and (self.channel is None or channel.id != self.channel.id):
+            if self.message:
+                try:
+                    await self.message.delete()
+                except discord.HTTPException:
+                    pass
+                self.message = None
+            self.channel = channel
+        if self.message is not None:
+            kwargs = {key: value for key, value in (('embed', embed), ('view', view)) if value is not None}
+            try:
+                self.message = await self.message.edit(**kwargs)
+                self.edits += 1
+                return
+            except discord.NotFound:
+                self.message = None
+        if self.channel is not None and embed is not None:
+            self.message = await self.channel.send(embed=embed, view=view, silent=True)
+            self.edits += 1
+
+    async def close(self):
+        """Stop pending updates and remove the buttons from the last message."""
+        if self._task:
+            self._task.cancel()
+        self._pending = None
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+        self.message = None
+        self.channel = None
@@ -0,0 +1,308 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from logic.music import tracing
+from logic.music.scheduler import JobScheduler, Priority
+from logic.music.ytdl_pool import YtdlPool
+
+# Per-process state, set up by init_worker (in the bot process itself for thread mode)
+_pool: YtdlPool | None = None
+_plain = False
+
+
+class ExtractionError(Exception):
+    """yt-dlp failure reduced to its message so it can cross a process boundary."""
+
+
+class YoutubeDegraded(ExtractionError):
+    """A foreground job refused because the governor's circuit breaker is open."""
+
+
+def init_worker(profiles: dict[str, dict], max_uses: int, plain: bool):
+    global _pool, _plain
+    _pool = YtdlPool(profiles, max_uses=max_uses)
+    _plain = plain
+
+
+def warm_up():
+    """Build one instance per profile so the first real job skips extractor registration."""
+    for profile in _pool.profiles:
+        with _pool.checkout(profile):
+            pass
+
+
+def extract_info(profile: str, url: str, overrides: dict | None = None) -> dict | None:
+    """Run one extraction on this process' YoutubeDL pool."""
+    try:
+        with _pool.checkout(profile, **(overrides or {})) as ydl:
+            info = ydl.extract_info(url, download=False)
+            # Worker processes hand back JSON-safe dicts only
+            return ydl.sanitize_info(info) if info and _plain else info
+    except Exception as e:
+        # yt-dlp exceptions carry tracebacks and are not always picklable
+        raise ExtractionError(str(e)) from None
+
+
+def download_audio(profile: str, url: str) -> str | None:
+    """Download ``url`` with a profile that sets ``outtmpl`` and return the stored file path."""
+    try:
+        with _pool.checkout(profile) as ydl:
+            info = ydl.extract_info(url, download=True)
+    except Exception as e:
+        raise ExtractionError(str(e)) from None
+    downloads = (info or {}).get("requested_downloads") or []
+    return downloads[0].get("filepath") if downloads else None
+
+
+class PageChannel:
+    """Hands pages from a job on the executor to the event loop, one per credit the loop grants.
+
+    Wraps the job's end of a ``multiprocessing.Pipe`` (pickled to the worker in
+    process mode), so the job only does the work for the next page once the
+    consumer asked for it, and stops as soon as the consumer is gone.
+    """
+
+    def __init__(self, conn, idle_timeout: float):
+        self.conn = conn
+        self.idle_timeout = idle_timeout
+
+    def wait(self) -> bool:
+        """Block until the next page is wanted; False when the consumer stopped (or went quiet)."""
+        try:
+            return self.conn.poll(self.idle_timeout) and self.conn.recv()
+        except (EOFError, OSError):
+            return False
+
+    def send(self, page: list, last: bool = False):
+        self.conn.send(("page", page, last))
+
+    def fail(self, message: str):
+        try:
+            self.conn.send(("error", message, True))
+        except OSError:
+            pass  # the consumer is gone
+
+    def close(self):
+        self.conn.close()
+
+
+def list_playlist(profile: str, url: str, start: int, limit: int, page_size: int, channel: PageChannel):
+    """Page through the flat entries ``start``..``limit`` of a playlist from a single lazy extraction.
+
+    Without processing, yt-dlp hands back the extractor's entry generator, which
+    requests each continuation page from YouTube only when the iteration reaches
+    it, so every page of the playlist is requested once.
+    """
+    try:
+        with _pool.checkout(profile) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            # Watch URLs with a list= point at the playlist tab
+            while info and info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(info["url"], download=False, ie_key=info.get("ie_key"), process=False)
+            entries = islice((info or {}).get("entries") or [], start - 1, limit)
+            while channel.wait():
+                page = [ydl.sanitize_info(e) if _plain else e for e in islice(entries, page_size) if e]
+                last = len(page) < page_size
+                channel.send(page, last)
+                if last:
+                    return
+    except Exception as e:
+        channel.fail(str(e))
+    finally:
+        channel.close()
+
+
+def _timed(fn, *args):
+    # monotonic is system-wide on Linux, so worker processes can report it too. The worker's pool
+    # counters ride along with the result, as a process pool cannot address its workers one by one
+    started = time.monotonic()
+    result = fn(*args)
+    return started, result, os.getpid(), ytdl_stats()
+
+
+def ytdl_stats() -> dict:
+    return _pool.stats() if _pool else {}
+
+
+class ExtractionEngine:
+    """Runs yt-dlp jobs on a thread pool or on warm worker processes.
+
+    yt-dlp parsing is mostly pure Python, so in ``process`` mode it no longer
+    competes with the event loop (and voice) for the GIL. ``thread`` mode keeps
+    the previous behaviour. At most ``concurrency`` jobs are handed to the
+    executor at once, so jobs still waiting are dropped when their caller is cancelled.
+    Which waiting job goes next is decided by the scheduler: by priority tier,
+    then round-robin across sessions, with at most ``background_concurrency``
+    background jobs running. With a ``governor`` every job first waits for its
+    request budget, and every outcome is reported back to it.
+
+    Downloads (``download``) take minutes rather than seconds, so they run on a
+    thread pool of their own, ``download_concurrency`` at a time, and never hold
+    one of the scheduler's slots or extraction workers.
+    """
+
+    def __init__(self, profiles: dict[str, dict], mode: str = "thread", workers: int | None = None,
+                 concurrency: int = 6, timeout: float = 60.0, max_uses: int = 200,
+                 background_concurrency: int | None = None, governor=None, download_concurrency: int = 1):
+        self.profiles = profiles
+        self.mode = mode
+        self.workers = workers
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.scheduler = JobScheduler(concurrency, background_concurrency)
+        self.governor = governor
+        self.executor = self._create_executor()
+        self._pool_stats: dict[int, dict] = {}  # pid -> YoutubeDL pool counters after its last job
+        self._download_slots = asyncio.Semaphore(download_concurrency)
+        self.download_executor = ThreadPoolExecutor(max_workers=download_concurrency,
+                                                    initializer=self._init_download_thread)
+
+    def _create_executor(self):
+        if self.mode == "process":
+            # fork: spawn/forkserver would re-import bot.py (and its side effects) in every worker
+            ctx = multiprocessing.get_context(
+                "fork") if "fork" in multiprocessing.get_all_start_methods() else None
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=init_worker,
+                                           initargs=(self.profiles, self.max_uses, True))
+            for _ in range(executor._max_workers):
+                executor.submit(warm_up)
+            return executor
+        init_worker(self.profiles, self.max_uses, False)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def _init_download_thread(self):
+        # In process mode the bot process has no pool of its own yet
+        if _pool is None:
+            init_worker(self.profiles, self.max_uses, False)
+
+    async def run(self, fn, *args, timeout: float | None = None, key=None):
+        """Run ``fn(*args)`` on the engine's executor and return its result.
+
+        The job is queued at the running task's priority (``scheduler.set_priority``);
+        ``key`` names it for ``JobScheduler.promote``. The time spent waiting for a
+        slot and a worker and the time of the job itself are added to the current trace.
+        """
+        queued = time.monotonic()
+        async with self.scheduler.slot(key) as priority:
+            # Admitted only once the slot is granted: the breaker may have tripped while the job queued
+            if self.governor and not await self.governor.admit(priority):
+                raise YoutubeDegraded(f"YouTube is throttling the bot, retrying in {self.governor.retry_in:.0f}s")
+            loop = asyncio.get_running_loop()
+            try:
+                started, result, pid, pool_stats = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, _timed, fn, *args), timeout or self.timeout)
+                self._pool_stats[pid] = pool_stats
+                tracing.add("executor wait", started - queued)
+                tracing.add("extraction", time.monotonic() - started)
+                if self.governor:
+                    self.governor.record()
+                return result
+            except ExtractionError as e:
+                if self.governor:
+                    self.governor.record(str(e))
+                raise
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool for the next jobs
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._create_executor()
+                raise ExtractionError("extraction worker crashed")
+
+    def ytdl_stats(self) -> dict:
+        """YoutubeDL pool counters summed over the bot process and every worker process that ran a job."""
+        pools = dict(self._pool_stats)
+        local = ytdl_stats()
+        if local:
+            pools[os.getpid()] = local
+        totals = {key: sum(pool.get(key, 0) for pool in pools.values())
+                  for key in ("created", "reused", "recycled", "build_seconds")}
+        avg_build = totals["build_seconds"] / totals["created"] if totals["created"] else 0.0
+        totals.update(avg_build_seconds=avg_build, build_seconds_saved=avg_build * totals["reused"],
+                      processes=len(pools))
+        return totals
+
+    async def pages(self, fn, *args, timeout: float | None = None, key=None):
+        """Async iterator over the pages ``fn(*args, channel)`` sends through a ``PageChannel``.
+
+        The job holds one scheduler slot while it is iterated, and each page is
+        admitted by the governor before the job is allowed to fetch it. Pages are
+        read off the pipe by the event loop as they arrive (no thread waits for
+        them); ``timeout`` bounds the wait for each page, and a failure in the job,
+        or of the job itself, raises ``ExtractionError``. Close the iterator
+        (``contextlib.aclosing``) to stop the job early.
+        """
+        async with self.scheduler.slot(key) as priority:
+            loop = asyncio.get_running_loop()
+            timeout = timeout or self.timeout
+            conn, job_conn = multiprocessing.Pipe()
+            inbox: asyncio.Queue = asyncio.Queue()
+
+            def receive():
+                try:
+                    inbox.put_nowait(conn.recv())
+                except (EOFError, OSError):
+                    # The job closed its end without a last page (or the pipe broke)
+                    loop.remove_reader(conn.fileno())
+                    inbox.put_nowait(("error", "playlist listing stopped", True))
+
+            def job_done(future):
+                if not future.cancelled() and future.exception() is not None:
+                    inbox.put_nowait(("error", str(future.exception()) or "playlist listing failed", True))
+
+            loop.add_reader(conn.fileno(), receive)
+            job = loop.run_in_executor(self.executor, fn, *args, PageChannel(job_conn, timeout))
+            job.add_done_callback(job_done)
+            try:
+                while True:
+                    if self.governor and not await self.governor.admit(priority):
+                        raise YoutubeDegraded(
+                            f"YouTube is throttling the bot, retrying in {self.governor.retry_in:.0f}s")
+                    conn.send(True)
+                    try:
+                        kind, page, last = await asyncio.wait_for(inbox.get(), timeout)
+                    except asyncio.TimeoutError:
+                        raise ExtractionError("playlist page timed out") from None
+                    if kind == "error":
+                        if self.governor:
+                            self.governor.record(page)
+                        raise ExtractionError(page)
+                    if self.governor:
+                        self.governor.record()
+                    yield page
+                    if last:
+                        return
+            finally:
+                loop.remove_reader(conn.fileno())
+                try:
+                    conn.send(False)
+                except OSError:
+                    pass  # the job already ended
+                conn.close()
+                if self.mode == "process":
+                    # The worker holds its own copy of the job's end
+                    job_conn.close()
+
+    async def download(self, fn, *args, timeout: float | None = None):
+        """Run the download job ``fn(*args)`` on the download pool, as background traffic for the governor."""
+        async with self._download_slots:
+            if self.governor:
+                await self.governor.admit(Priority.BACKGROUND)
+            loop = asyncio.get_running_loop()
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(self.download_executor, fn, *args),
+                                                timeout or self.timeout)
+            except ExtractionError as e:
+                if self.governor:
+                    self.governor.record(str(e))
+                raise
+            if self.governor:
+                self.governor.record()
+            return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.download_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,85 @@
+import asyncio
+import re
+import time
+
+from logic.music.scheduler import Priority
+
+# yt-dlp messages meaning YouTube is throttling or bot-checking this IP
+_THROTTLED_RE = re.compile(r"sign in to confirm|not a bot|http error 429|too many requests", re.IGNORECASE)
+
+
+def is_throttled(message: str) -> bool:
+    return bool(_THROTTLED_RE.search(message or ''))
+
+
+class YoutubeGovernor:
+    """Shared pace and circuit breaker for every request the bot makes to YouTube.
+
+    A token bucket caps the request rate at ``rate`` per second (bursts up to
+    ``burst``); background requests leave ``reserve`` tokens for the ones a
+    user waits on. A bot-check or 429 answer opens the breaker for ``cooldown``
+    seconds, doubling on every trip in a row up to ``max_cooldown``. While it is
+    open background requests wait for it to close, and foreground ones are
+    refused at once so the user can be told the bot is degraded. After the
+    cool-down the next request is a probe: success resets the cool-down, another
+    bot-check trips it again for twice as long.
+    """
+
+    def __init__(self, rate: float, burst: int, reserve: int = 0, cooldown: float = 60.0,
+                 max_cooldown: float = 3600.0):
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._open_until = 0.0
+        self.trips = 0  # consecutive trips; reset by a successful request
+        self.total_trips = 0
+        self.refused = 0
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the breaker closes (0 when closed)."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    async def admit(self, priority: Priority) -> bool:
+        """Wait for the request's turn; False if it is a foreground request and the breaker is open."""
+        background = priority == Priority.BACKGROUND
+        while True:
+            if self.is_open:
+                if not background:
+                    self.refused += 1
+                    return False
+                await asyncio.sleep(self.retry_in)
+                continue
+            self._refill()
+            needed = 1 + (self.reserve if background else 0)
+            if self._tokens >= needed:
+                self._tokens -= 1
+                return True
+            await asyncio.sleep((needed - self._tokens) / self.rate)
+
+    def record(self, error: str | None = None):
+        """Report a request's outcome: None for success, else the error message."""
+        if error is None:
+            self.trips = 0
+        elif is_throttled(error) and not self.is_open:
+            self.trips += 1
+            self.total_trips += 1
+            self._open_until = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** (self.trips - 1))
+
+    def status(self) -> str:
+        if self.is_open:
+            return f"degraded, retrying in {self.retry_in:.0f}s (trip {self.trips})"
+        return "ok"
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import math
+import re
+import shlex
+import threading
+from collections import OrderedDict
+
+import mysql.connector
+
+from database import DatabaseManager
+from settings import get_logger
+
+logger = get_logger()
+
+# loudnorm prints its measurements as a JSON object at the end of stderr
+_LOUDNORM_JSON_RE = re.compile(r'\{[^{}]*"input_i"[^{}]*\}')
+
+
+def get_loudness(video_id: str):
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT GAIN_DB FROM MUSIC_LOUDNESS WHERE VIDEO_ID = %s", (video_id,))
+        return cursor.fetchone()
+
+
+def save_loudness(video_id: str, integrated: float, true_peak: float, gain_db: float) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO MUSIC_LOUDNESS (VIDEO_ID, INTEGRATED_LUFS, TRUE_PEAK_DB, GAIN_DB, ANALYZED_AT)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE INTEGRATED_LUFS = VALUES(INTEGRATED_LUFS), TRUE_PEAK_DB = VALUES(TRUE_PEAK_DB),
+                GAIN_DB = VALUES(GAIN_DB), ANALYZED_AT = NOW()
+            """,
+            (video_id, integrated, true_peak, gain_db))
+        conn.commit()
+
+
+async def measure_loudness(audio_input: str, before_options: str | None = None,
+                           timeout: float = 120.0) -> tuple[float, float] | None:
+    """Integrated loudness (LUFS) and true peak (dBTP) of a file or stream, measured by ffmpeg's loudnorm."""
+    args = ['ffmpeg', '-hide_banner', '-nostats', *shlex.split(before_options or ''), '-i', audio_input,
+            '-vn', '-threads', '1', '-af', 'loudnorm=print_format=json', '-f', 'null', '-']
+    proc = await asyncio.create_subprocess_exec(*args, stdin=asyncio.subprocess.DEVNULL,
+                                                stdout=asyncio.subprocess.DEVNULL,
+                                                stderr=asyncio.subprocess.PIPE)
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        await proc.wait()
+        raise
+    match = _LOUDNORM_JSON_RE.search(stderr.decode(errors='replace'))
+    if proc.returncode != 0 or not match:
+        return None
+    data = json.loads(match.group(0))
+    integrated, true_peak = float(data['input_i']), float(data['input_tp'])
+    if not (math.isfinite(integrated) and math.isfinite(true_peak)):
+        return None  # silence
+    return integrated, true_peak
+
+
+def gain_for(integrated: float, true_peak: float, target: float, max_peak: float, max_boost: float) -> float:
+    """Gain (dB) bringing a track to ``target`` LUFS without pushing its peak over ``max_peak``."""
+    return round(min(target - integrated, max_peak - true_peak, max_boost), 2)
+
+
+class LoudnessStore:
+    """Per-video playback gain, measured once and stored in MUSIC_LOUDNESS.
+
+    An LRU of recent lookups (including "not analysed yet") sits in front of
+    the database so the playback path rarely waits on it. Methods are
+    blocking; run them in an executor.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._gains: OrderedDict[str, float | None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_cached(self, video_id: str) -> bool:
+        return video_id in self._gains
+
+    def cached(self, video_id: str) -> float | None:
+        with self._lock:
+            gain = self._gains.get(video_id)
+            if video_id in self._gains:
+                self._gains.move_to_end(video_id)
+            return gain
+
+    def _remember(self, video_id: str, gain: float | None):
+        with self._lock:
+            self._gains[video_id] = gain
+            self._gains.move_to_end(video_id)
+            while len(self._gains) > self.max_entries:
+                self._gains.popitem(last=False)
+
+    def lookup(self, video_id: str) -> float | None:
+        if self.is_cached(video_id):
+            return self.cached(video_id)
+        try:
+            row = get_loudness(video_id)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Loudness lookup failed for {video_id}: {e}')
+            return None
+        gain = float(row[0]) if row else None
+        self._remember(video_id, gain)
+        return gain
+
+    def store(self, video_id: str, integrated: float, true_peak: float, gain_db: float):
+        self._remember(video_id, gain_db)
+        try:
+            save_loudness(video_id, integrated, true_peak, gain_db)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Loudness store failed for {video_id}: {e}')
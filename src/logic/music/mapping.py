@@ -0,0 +1,75 @@
+import asyncio
+
+
+class OrderedMapper:
+    """Resolves a stream of items on a pool of workers and emits the results in input order.
+
+    Items may be put out of order with an explicit ``seq`` (e.g. pages fetched
+    concurrently); sequence numbers must then cover every position from
+    ``start`` on, None items standing in for positions with nothing to resolve.
+    ``put`` blocks while ``seq`` is ``window`` or more ahead of the next result
+    to emit, so one slow item never makes the reorder buffer grow without bound.
+    A result is emitted as soon as every item before it is done; items
+    resolving to None are dropped.
+    Use as an async context manager: leaving the block (or cancelling the task
+    running it) cancels the workers.
+    """
+
+    def __init__(self, resolve, emit, workers: int = 6, window: int = 50, start: int = 0):
+        self.resolve = resolve
+        self.emit = emit
+        self.workers = workers
+        self.window = window
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._progress = asyncio.Condition()
+        self._results: dict[int, object] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._submitted = start
+        self._next = start
+        self.emitted = 0
+
+    async def __aenter__(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def put(self, item, seq: int | None = None):
+        if seq is None:
+            seq = self._submitted
+        self._submitted = max(self._submitted, seq + 1)
+        async with self._progress:
+            await self._progress.wait_for(lambda: seq < self._next + self.window)
+        self._jobs.put_nowait((seq, item))
+
+    async def join(self):
+        """Wait until every item put so far has been resolved and emitted."""
+        await self._jobs.join()
+
+    async def _worker(self):
+        while True:
+            seq, item = await self._jobs.get()
+            try:
+                result = await self.resolve(item) if item is not None else None
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                result = None
+            self._results[seq] = result
+            if self._flush():
+                async with self._progress:
+                    self._progress.notify_all()
+            self._jobs.task_done()
+
+    def _flush(self) -> bool:
+        start = self._next
+        while self._next in self._results:
+            result = self._results.pop(self._next)
+            self._next += 1
+            if result is not None:
+                self.emit(result)
+                self.emitted += 1
+        return self._next != start
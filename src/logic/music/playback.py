@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import deque
+
+import discord
+
+FRAME_SECONDS = 0.02  # discord.py reads one 20 ms frame per AudioSource.read()
+
+
+def process_cpu_seconds(pid: int) -> float | None:
+    """User + system CPU time of a process that has not been reaped yet, running or exited (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of the full stat line
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MeteredSource(discord.AudioSource):
+    """Wraps an audio source to measure what one stream costs.
+
+    Bot CPU is the voice player thread's CPU time (reading, volume scaling,
+    Opus encoding and sending), ffmpeg CPU is read from /proc right before
+    the process is killed and reaped on cleanup; a track that played to the
+    end leaves an exited but unreaped ffmpeg whose times are still there. ``on_first_frame`` is called from the
+    voice player thread when the first frame has been read.
+
+    ``preroll`` starts reading ahead on a helper thread before the source is
+    played, so ffmpeg has connected and buffered by the time the voice client
+    asks for the first frame.
+    """
+
+    def __init__(self, source: discord.AudioSource, ffmpeg: discord.FFmpegAudio, mode: str, on_done=None,
+                 on_first_frame=None):
+        self.source = source
+        self.ffmpeg = ffmpeg
+        self.mode = mode
+        self.on_done = on_done
+        self.on_first_frame = on_first_frame
+        self.frames = 0
+        self.offset = 0.0  # where in the track playback started (resumed sessions)
+        self._thread_cpu_start = None
+        self._buffer: deque[bytes] = deque()
+        self._fill_lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    @property
+    def position(self) -> float:
+        """Position in the track: the start offset plus the audio handed to the voice client so far."""
+        return self.offset + self.frames * FRAME_SECONDS
+
+    def preroll(self, frames: int):
+        """Read up to ``frames`` frames ahead in the background."""
+        threading.Thread(target=self._fill, args=(frames,), daemon=True).start()
+
+    def _fill(self, frames: int):
+        while len(self._buffer) < frames:
+            with self._fill_lock:
+                if self._started or self._closed:
+                    return
+                try:
+                    data = self.source.read()
+                except Exception:
+                    return
+                if not data:
+                    return
+                self._buffer.append(data)
+
+    @property
+    def buffered(self) -> float:
+        """Seconds of audio read ahead and not played yet."""
+        return len(self._buffer) * FRAME_SECONDS
+
+    def read(self) -> bytes:
+        if self._thread_cpu_start is None:
+            self._thread_cpu_start = time.thread_time()
+        if not self._started:
+            self._started = True
+            with self._fill_lock:
+                pass  # let a read-ahead in progress finish
+        data = self._buffer.popleft() if self._buffer else self.source.read()
+        if data:
+            self.frames += 1
+            if self.frames == 1 and self.on_first_frame:
+                self.on_first_frame()
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self._closed = True
+        bot_cpu = time.thread_time() - self._thread_cpu_start if self._thread_cpu_start is not None else 0.0
+        process = getattr(self.ffmpeg, '_process', None)
+        # No poll() here: it would reap an exited ffmpeg and take its /proc entry (and times) with it
+        ffmpeg_cpu = process_cpu_seconds(process.pid) if process and process.returncode is None else None
+        self.source.cleanup()
+        if self.on_done and self.frames:
+            self.on_done(self.mode, self.frames * FRAME_SECONDS, bot_cpu, ffmpeg_cpu)
+
+
+class StreamCpuStats:
+    """Per playback mode totals so modes can be compared (CPU seconds per second of audio).
+
+    Streams whose ffmpeg CPU could not be read are left out of the ffmpeg share
+    (instead of counting as 0) and counted apart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # mode -> [streams, audio s, bot cpu s, ffmpeg audio s, ffmpeg cpu s, streams without ffmpeg cpu]
+        self._totals: dict[str, list[float]] = {}
+
+    def record(self, mode: str, seconds: float, bot_cpu: float, ffmpeg_cpu: float | None):
+        with self._lock:
+            totals = self._totals.setdefault(mode, [0, 0.0, 0.0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += bot_cpu
+            if ffmpeg_cpu is None:
+                totals[5] += 1
+            else:
+                totals[3] += seconds
+                totals[4] += ffmpeg_cpu
+
+    def summary(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                mode: {
+                    "streams": int(streams),
+                    "audio_seconds": seconds,
+                    "bot_cpu_pct": 100 * bot / seconds if seconds else 0.0,
+                    "ffmpeg_cpu_pct": 100 * ffmpeg / ffmpeg_seconds if ffmpeg_seconds else 0.0,
+                    "ffmpeg_unmeasured": int(unmeasured),
+                }
+                for mode, (streams, seconds, bot, ffmpeg_seconds, ffmpeg, unmeasured) in self._totals.items()
+            }
@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import threading
+
+import discord
+
+from logic.music.controller import NowPlayingController
+from logic.music.track_queue import TrackQueue
+from logic.music.tracing import TraceStats
+
+# Weight of the latest transition in the skip-rate moving average
+SKIP_RATE_ALPHA = 0.3
+
+
+class GuildPlayer:
+    """Music session for a single guild.
+
+    Owns the queue, voice client, now-playing controller and timers so several
+    guilds can play at the same time without sharing state.
+    """
+
+    def __init__(self, guild_id: int, history_size: int = 20, controller_interval: float = 1.0,
+                 trace_window: int = 200):
+        self.guild_id = guild_id
+        self.queue = TrackQueue(history_size)
+        self.is_playing = False
+        self.voice_client: discord.VoiceClient = None
+        self.controller = NowPlayingController(controller_interval)
+        self.controller_view: discord.ui.View = None
+        self.trace_stats = TraceStats(trace_window)  # time to first audio of this session
+        self.inactivity_timer: threading.Timer = None
+        self.tasks: set[asyncio.Task] = set()  # tasks owned by this session
+        self.background_tasks: set[asyncio.Task] = set()  # playlist fetches feeding the queue
+        self.prefetch_tasks: dict[str, asyncio.Task] = {}  # video id -> stream resolve in flight
+        self.preroll: tuple[int, discord.AudioSource] | None = None  # (entry id, opened and buffering source)
+        self.skip_rate = 0.0
+        self.skip_pending = False  # set by skip_to so the stop() callback is not counted as a completion
+        self.voice_channel: discord.VoiceChannel | None = None  # where the queue plays
+        self.text_channel_id: int | None = None  # where playback was last started from
+        self.last_user: discord.User | None = None  # who started the current track
+        self.checkpoint_version: int | None = None  # queue version of the last saved checkpoint
+
+    def spawn(self, coro, background: bool = False) -> asyncio.Task:
+        """Run a coroutine tied to this session (cancelled on disconnect).
+
+        Background tasks are the ones filling the queue; they are also cancelled when it is cleared.
+        """
+        tasks = self.background_tasks if background else self.tasks
+        # Queue fillers outlive the command that started them: they get a fresh context (no trace)
+        task = asyncio.get_event_loop().create_task(coro, context=contextvars.Context() if background else None)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def cancel_background(self):
+        for task in list(self.background_tasks):
+            task.cancel()
+        self.background_tasks.clear()
+
+    def track_prefetch(self, video_id: str, task: asyncio.Task):
+        self.prefetch_tasks[video_id] = task
+
+        def forget(done: asyncio.Task):
+            if self.prefetch_tasks.get(video_id) is done:
+                del self.prefetch_tasks[video_id]
+
+        task.add_done_callback(forget)
+
+    def cancel_prefetch(self, keep: set[str] = frozenset()):
+        for video_id in list(self.prefetch_tasks):
+            if video_id not in keep:
+                self.prefetch_tasks.pop(video_id).cancel()
+
+    def set_preroll(self, entry_id: int, source: discord.AudioSource):
+        self.drop_preroll()
+        self.preroll = (entry_id, source)
+
+    def take_preroll(self, entry_id: int | None) -> discord.AudioSource | None:
+        """The pre-rolled source if it is for ``entry_id``; a pre-roll for another entry is closed."""
+        preroll, self.preroll = self.preroll, None
+        if preroll is None:
+            return None
+        if preroll[0] == entry_id:
+            return preroll[1]
+        preroll[1].cleanup()
+        return None
+
+    def drop_preroll(self):
+        self.take_preroll(None)
+
+    def cancel_tasks(self):
+        self.cancel_background()
+        self.cancel_prefetch()
+        self.drop_preroll()
+        for task in list(self.tasks):
+            task.cancel()
+        self.tasks.clear()
+
+    def reset(self):
+        self.drop_preroll()
+        self.is_playing = False
+        self.queue.reset()
+
+    def in_voice_channel(self):
+        return self.voice_client is not None
+
+    def start_inactivity_timer(self, minutes: int, callback):
+        if self.inactivity_timer:
+            self.inactivity_timer.cancel()
+        self.inactivity_timer = threading.Timer(minutes * 60, callback)
+        self.inactivity_timer.start()
+
+    def reset_inactivity_timer(self):
+        if self.inactivity_timer:
+            self.inactivity_timer.cancel()
+            self.inactivity_timer = None
+
+    def record_transition(self, skipped: bool):
+        """Update the skip-rate estimate that sizes the prefetch window."""
+        self.skip_rate = (1 - SKIP_RATE_ALPHA) * self.skip_rate + SKIP_RATE_ALPHA * (1.0 if skipped else 0.0)
+
+    def prefetch_window(self, minimum: int, maximum: int) -> int:
+        """Number of upcoming tracks to keep resolved; grows when users skip a lot."""
+        return minimum + round(self.skip_rate * (maximum - minimum))
+
+    def upcoming(self, count: int) -> list:
+        return self.queue.upcoming(count)
+
+    def exists_next_song_in_queue(self):
+        return self.queue.has_next()
+
+    def get_current_song_from_queue(self):
+        current = self.queue.current
+        return current['song'] if current else None
+
+    def get_current_from_queue(self):
+        return self.queue.current
+
+    def get_previous_song(self):
+        previous = self.queue.previous
+        return previous['song'] if previous else None
+
+    def is_queue_empty(self):
+        return len(self.queue) == 0
+
+    def clear_queue_impl(self):
+        self.queue.clear()
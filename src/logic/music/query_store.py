@@ -0,0 +1,102 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from database import DatabaseManager
+from settings import get_logger
+
+logger = get_logger()
+
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a free-text search so trivially different spellings share one mapping."""
+    query = unicodedata.normalize('NFKC', query).casefold()
+    query = _NON_WORD_RE.sub(' ', query)
+    return _SPACES_RE.sub(' ', query).strip()[:255]
+
+
+def get_query_mapping(query_key: str):
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT VIDEO_ID, TITLE, RESOLVED_AT FROM MUSIC_QUERY_CACHE WHERE QUERY_KEY = %s", (query_key,))
+        return cursor.fetchone()
+
+
+def record_query_hit(query_key: str) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE MUSIC_QUERY_CACHE SET HITS = HITS + 1, LAST_HIT_AT = NOW() WHERE QUERY_KEY = %s",
+            (query_key,))
+        conn.commit()
+
+
+def save_query_mapping(query_key: str, video_id: str, title: str | None) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO MUSIC_QUERY_CACHE (QUERY_KEY, VIDEO_ID, TITLE, RESOLVED_AT)
+            VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE VIDEO_ID = VALUES(VIDEO_ID), TITLE = VALUES(TITLE), RESOLVED_AT = NOW()
+            """,
+            (query_key, video_id, title[:500] if title else None))
+        conn.commit()
+
+
+class QueryStore:
+    """Persistent query -> YouTube video mapping with hit/miss counters.
+
+    Mappings older than ``max_age_days`` are reported as stale so the caller
+    searches again and refreshes them. Methods are blocking; run them in an executor.
+    """
+
+    def __init__(self, max_age_days: int):
+        self.max_age = timedelta(days=max_age_days)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def lookup(self, query: str) -> tuple[str, str | None] | None:
+        key = normalize_query(query)
+        if not key:
+            return None
+        try:
+            row = get_query_mapping(key)
+            if row is None:
+                self.misses += 1
+                return None
+            video_id, title, resolved_at = row
+            if resolved_at and datetime.now() - resolved_at > self.max_age:
+                self.stale += 1
+                return None
+            record_query_hit(key)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Query cache lookup failed: {e}')
+            return None
+        self.hits += 1
+        return video_id, title
+
+    def store(self, query: str, video_id: str, title: str | None):
+        key = normalize_query(query)
+        if not key or not video_id:
+            return
+        try:
+            save_query_mapping(key, video_id, title)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Query cache store failed: {e}')
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.stale
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+from logic.music.tracing import percentile
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # a user waits on the reply: /play search and extraction, a playlist's first entry
+    NEXT_TRACK = 1  # the stream of the track about to play (track start, skip, pre-roll)
+    BACKGROUND = 2  # prefetch, playlist pages, Spotify mapping, loudness, audio cache downloads
+
+
+# Priority and session (guild id) of the jobs the running task submits
+current: contextvars.ContextVar[tuple[Priority, int | None]] = contextvars.ContextVar(
+    'music_job', default=(Priority.BACKGROUND, None))
+
+
+def set_priority(priority: Priority, session: int | None = None):
+    """Submit the running task's jobs (and those of the tasks it creates) at ``priority`` for ``session``."""
+    current.set((priority, session))
+
+
+def current_priority() -> Priority:
+    return current.get()[0]
+
+
+class _Waiter:
+    __slots__ = ('future', 'priority', 'session', 'key', 'queued')
+
+    def __init__(self, future: asyncio.Future, priority: Priority, session: int | None, key, queued: float):
+        self.future = future
+        self.priority = priority
+        self.session = session
+        self.key = key
+        self.queued = queued
+
+
+class JobScheduler:
+    """Hands a fixed number of job slots out by priority tier, round-robin across sessions within a tier.
+
+    A higher tier always goes first. Background jobs never hold more than
+    ``background_slots`` slots, so a user action finds a free slot instead of
+    queueing behind a playlist import, and one guild's import cannot starve
+    another's. A waiting job can be promoted when a more urgent caller needs
+    the same result (``promote``). Waits and queue depths are kept per tier.
+    """
+
+    def __init__(self, slots: int, background_slots: int | None = None, window: int = 500):
+        self.slots = slots
+        self.background_slots = min(background_slots or slots, slots)
+        self.running = 0
+        self._running_background = 0
+        self._queues: dict[Priority, OrderedDict[int | None, deque[_Waiter]]] = {p: OrderedDict() for p in Priority}
+        self._depth = {p: 0 for p in Priority}
+        self.max_depth = {p: 0 for p in Priority}
+        self.jobs = {p: 0 for p in Priority}
+        self._waits = {p: deque(maxlen=window) for p in Priority}
+
+    def depth(self, priority: Priority) -> int:
+        return self._depth[priority]
+
+    def _can_start(self, priority: Priority) -> bool:
+        if self.running >= self.slots:
+            return False
+        return priority != Priority.BACKGROUND or self._running_background < self.background_slots
+
+    def _start(self, priority: Priority, waited: float):
+        self.running += 1
+        if priority == Priority.BACKGROUND:
+            self._running_background += 1
+        self.jobs[priority] += 1
+        self._waits[priority].append(waited)
+
+    def _release(self, priority: Priority):
+        self.running -= 1
+        if priority == Priority.BACKGROUND:
+            self._running_background -= 1
+        self._dispatch()
+
+    def _enqueue(self, waiter: _Waiter):
+        self._queues[waiter.priority].setdefault(waiter.session, deque()).append(waiter)
+        self._depth[waiter.priority] += 1
+        self.max_depth[waiter.priority] = max(self.max_depth[waiter.priority], self._depth[waiter.priority])
+
+    def _remove(self, waiter: _Waiter) -> bool:
+        queues = self._queues[waiter.priority]
+        waiters = queues.get(waiter.session)
+        if not waiters or waiter not in waiters:
+            return False
+        waiters.remove(waiter)
+        if not waiters:
+            del queues[waiter.session]
+        self._depth[waiter.priority] -= 1
+        return True
+
+    def _dispatch(self):
+        for priority in Priority:
+            queues = self._queues[priority]
+            while queues and self._can_start(priority):
+                session, waiters = next(iter(queues.items()))
+                waiter = waiters.popleft()
+                # Next job of this tier comes from the next session
+                if waiters:
+                    queues.move_to_end(session)
+                else:
+                    del queues[session]
+                self._depth[priority] -= 1
+                if waiter.future.done():
+                    continue  # cancelled
+                self._start(priority, time.monotonic() - waiter.queued)
+                waiter.future.set_result(priority)
+
+    async def _acquire(self, priority: Priority, session: int | None, key) -> Priority:
+        queued_ahead = any(self._depth[p] for p in Priority if p <= priority)
+        if not queued_ahead and self._can_start(priority):
+            self._start(priority, 0.0)
+            return priority
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority, session, key, time.monotonic())
+        self._enqueue(waiter)
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(waiter.future.result())  # granted just as the caller gave up
+            else:
+                self._remove(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, key=None):
+        """Hold a slot for the running task's priority and session (see ``set_priority``).
+
+        Yields the priority the slot was granted at, which is higher if the job was promoted while waiting.
+        """
+        priority, session = current.get()
+        granted = await self._acquire(priority, session, key)
+        try:
+            yield granted
+        finally:
+            self._release(granted)
+
+    def promote(self, key, priority: Priority):
+        """Move the waiting job for ``key`` up to ``priority``; its wait still counts from when it was queued."""
+        if key is None:
+            return
+        for lower in Priority:
+            if lower <= priority:
+                continue
+            for waiters in list(self._queues[lower].values()):
+                for waiter in waiters:
+                    if waiter.key == key and not waiter.future.done():
+                        self._remove(waiter)
+                        waiter.priority = priority
+                        self._enqueue(waiter)
+                        self._dispatch()
+                        return
+
+    def stats(self) -> dict[str, dict]:
+        """Per tier: jobs queued now and at most, jobs started, and wait percentiles (s) over the last window."""
+        result = {}
+        for priority in Priority:
+            waits = sorted(self._waits[priority])
+            result[priority.name.lower()] = {
+                'queued': self._depth[priority],
+                'max_queued': self.max_depth[priority],
+                'jobs': self.jobs[priority],
+                'wait_p50': percentile(waits, 50),
+                'wait_p95': percentile(waits, 95),
+                'wait_max': waits[-1] if waits else 0.0,
+            }
+        return result
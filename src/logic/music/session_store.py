@@ -0,0 +1,142 @@
+import mysql.connector
+
+from database import DatabaseManager
+from logic.music.track import Track
+from settings import get_logger
+
+logger = get_logger()
+
+_SESSION_COLUMNS = ('GUILD_ID', 'VOICE_CHANNEL_ID', 'TEXT_CHANNEL_ID', 'USER_ID', 'CURRENT_ENTRY', 'HISTORY',
+                    'UPCOMING', 'SHUFFLED', 'IS_PLAYING', 'POSITION_SECONDS')
+
+
+def _join_ids(ids: list[int]) -> str:
+    return ','.join(map(str, ids))
+
+
+def _split_ids(value: str | None) -> list[int]:
+    return [int(entry_id) for entry_id in value.split(',')] if value else []
+
+
+def save_session(guild_id: int, session: tuple, upserts: list[tuple], removed: list[int]) -> None:
+    """Write the session row and the changed queue entries in one transaction."""
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            INSERT INTO MUSIC_SESSION ({', '.join(_SESSION_COLUMNS)}, UPDATED_AT)
+            VALUES ({', '.join(['%s'] * len(_SESSION_COLUMNS))}, NOW())
+            ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in _SESSION_COLUMNS[1:])},
+                UPDATED_AT = NOW()
+            """,
+            (guild_id, *session))
+        if upserts:
+            cursor.executemany(
+                """
+                INSERT INTO MUSIC_SESSION_ENTRY
+                    (GUILD_ID, ENTRY_ID, ORDER_KEY, VIDEO_ID, TITLE, URL, THUMBNAIL)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE ORDER_KEY = VALUES(ORDER_KEY), VIDEO_ID = VALUES(VIDEO_ID),
+                    TITLE = VALUES(TITLE), URL = VALUES(URL), THUMBNAIL = VALUES(THUMBNAIL)
+                """,
+                [(guild_id, *row) for row in upserts])
+        if removed:
+            cursor.executemany("DELETE FROM MUSIC_SESSION_ENTRY WHERE GUILD_ID = %s AND ENTRY_ID = %s",
+                               [(guild_id, entry_id) for entry_id in removed])
+        conn.commit()
+
+
+def delete_session(guild_id: int) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM MUSIC_SESSION_ENTRY WHERE GUILD_ID = %s", (guild_id,))
+        cursor.execute("DELETE FROM MUSIC_SESSION WHERE GUILD_ID = %s", (guild_id,))
+        conn.commit()
+
+
+def get_sessions():
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(_SESSION_COLUMNS)}, TIMESTAMPDIFF(SECOND, UPDATED_AT, NOW()) "
+                       f"FROM MUSIC_SESSION")
+        return cursor.fetchall()
+
+
+def get_session_entries(guild_id: int):
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT ENTRY_ID, ORDER_KEY, VIDEO_ID, TITLE, URL, THUMBNAIL
+            FROM MUSIC_SESSION_ENTRY WHERE GUILD_ID = %s
+            """,
+            (guild_id,))
+        return cursor.fetchall()
+
+
+class SessionStore:
+    """Checkpoints of live music sessions in MUSIC_SESSION / MUSIC_SESSION_ENTRY, to resume them after a restart.
+
+    The entry ids and order keys already written are remembered per guild, so a
+    checkpoint only writes the entries that were added or re-keyed and deletes
+    the ones that left the queue; the layout (history, current, upcoming in play
+    order, i.e. the shuffle permutation) is rewritten as id lists on the session
+    row. Stream URLs are not stored: they expire and are resolved again on resume.
+    Methods are blocking; run them in an executor.
+    """
+
+    def __init__(self):
+        self._saved: dict[int, dict[int, float]] = {}  # guild id -> {entry id: order key} in the database
+
+    def checkpoint(self, guild_id: int, session: dict, entries: list[tuple] | None) -> bool:
+        """Save a session; ``entries`` are (id, order, video id, title, url, thumbnail) rows of the whole
+        queue (see ``Track.fields``), or None when it did not change since the last checkpoint."""
+        saved = self._saved.get(guild_id, {})
+        upserts, removed, written = [], [], saved
+        if entries is not None:
+            written = {row[0]: row[1] for row in entries}
+            upserts = [row[:3] + (row[3][:500] if row[3] else None,) + row[4:] for row in entries
+                       if saved.get(row[0]) != row[1]]
+            removed = [entry_id for entry_id in saved if entry_id not in written]
+        row = (session['voice_channel_id'], session['text_channel_id'], session['user_id'], session['current'],
+               _join_ids(session['history']), _join_ids(session['upcoming']), session['shuffled'],
+               session['playing'], session['position'])
+        try:
+            save_session(guild_id, row, upserts, removed)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Music session checkpoint failed for guild {guild_id}: {e}')
+            return False
+        self._saved[guild_id] = written
+        return True
+
+    def delete(self, guild_id: int):
+        if self._saved.pop(guild_id, None) is None:
+            return
+        try:
+            delete_session(guild_id)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not delete the music session of guild {guild_id}: {e}')
+
+    def load(self) -> list[tuple[dict, list[dict]]]:
+        """Every saved session (``age`` in seconds since its last checkpoint) with its queue entries."""
+        try:
+            rows = get_sessions()
+            sessions = []
+            for row in rows:
+                session = dict(zip(('guild_id', 'voice_channel_id', 'text_channel_id', 'user_id', 'current',
+                                    'history', 'upcoming', 'shuffled', 'playing', 'position', 'age'), row))
+                session['history'] = _split_ids(session['history'])
+                session['upcoming'] = _split_ids(session['upcoming'])
+                session['shuffled'] = bool(session['shuffled'])
+                session['playing'] = bool(session['playing'])
+                session['position'] = float(session['position'] or 0.0)
+                entries = [{'id': entry_id, 'order': float(order),
+                            'song': Track(video_id, title, url=url, thumbnail=thumbnail)}
+                           for entry_id, order, video_id, title, url, thumbnail
+                           in get_session_entries(session['guild_id'])]
+                self._saved[session['guild_id']] = {entry['id']: entry['order'] for entry in entries}
+                sessions.append((session, entries))
+            return sessions
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not load the saved music sessions: {e}')
+            return []
@@ -0,0 +1,42 @@
+import asyncio
+
+
+class SingleFlight:
+    """Runs at most one coroutine per key; concurrent callers for the same key share its result.
+
+    Each caller awaits the shared task through a shield, so a caller that is
+    cancelled (a skipped track, a cancelled prefetch) only stops waiting. The
+    task itself is cancelled once the last caller waiting on it gave up.
+    """
+
+    def __init__(self):
+        self._calls: dict[object, list] = {}  # key -> [task, callers waiting]
+        self.started = 0
+        self.shared = 0  # calls that joined a task already in flight
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def run(self, key, factory):
+        """Await ``factory()`` for ``key``, or the call for ``key`` already in flight."""
+        call = self._calls.get(key)
+        # A call nobody waits on any more is being cancelled: start over
+        if call is None or call[1] == 0:
+            task = asyncio.get_event_loop().create_task(factory())
+            call = self._calls[key] = [task, 0]
+            self.started += 1
+
+            def forget(_):
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+            task.add_done_callback(forget)
+        else:
+            self.shared += 1
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                call[0].cancel()
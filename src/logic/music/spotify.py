@@ -0,0 +1,167 @@
+import asyncio
+import re
+import time
+
+import aiohttp
+
+from settings import get_logger
+
+logger = get_logger()
+
+API_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+# Answers retried with a backoff; 429 is raised for the caller to wait out Retry-After
+_RETRIED_STATUSES = (500, 502, 503, 504)
+_ID_RE = re.compile(r"(?:open\.spotify\.com/(?:intl-[\w-]+/)?|spotify:)(?:track|album|playlist)[/:]([A-Za-z0-9]+)")
+
+
+class SpotifyError(Exception):
+    def __init__(self, http_status: int, message: str, retry_after: float | None = None):
+        super().__init__(f"Spotify answered {http_status}: {message}")
+        self.http_status = http_status
+        self.retry_after = retry_after
+
+
+def spotify_id(url: str) -> str:
+    """Id of a Spotify track/album/playlist URL or URI (or the input itself when it already is one)."""
+    match = _ID_RE.search(url)
+    return match.group(1) if match else url.split("/")[-1].split("?")[0]
+
+
+class SpotifyClient:
+    """Spotify Web API client (client credentials flow) on one pooled aiohttp session.
+
+    Every call shares one access token. After the first fetch a background task
+    (``start``) renews it ``refresh_margin`` seconds before it expires, so calls
+    only wait for a token when the bot starts or a renewal failed. Timeouts,
+    connection errors and 5xx answers are retried ``retries`` times with a
+    backoff; a 401 renews the token once; other errors, 429 included, raise
+    ``SpotifyError`` (429 with its Retry-After).
+    """
+
+    def __init__(self, client_id: str | None, client_secret: str | None, connections: int = 8,
+                 timeout: float = 10.0, refresh_margin: float = 300.0, retries: int = 3):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.connections = connections
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.retries = retries
+        self._session: aiohttp.ClientSession | None = None
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._refresher: asyncio.Task | None = None
+        self.token_fetches = 0
+        self.requests = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    def _http(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.connections),
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def start(self):
+        """Start the background token renewal (on the running loop)."""
+        if self.configured and (self._refresher is None or self._refresher.done()):
+            self._refresher = asyncio.get_event_loop().create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresher:
+            self._refresher.cancel()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _fetch_token(self):
+        async with self._http().post(TOKEN_URL, data={"grant_type": "client_credentials"},
+                                     auth=aiohttp.BasicAuth(self.client_id, self.client_secret)) as resp:
+            body = await resp.json(content_type=None)
+            if resp.status != 200:
+                raise SpotifyError(resp.status, (body or {}).get("error_description") or "token request failed")
+        expires_in = float(body.get("expires_in") or 3600)
+        now = time.monotonic()
+        self._token = body["access_token"]
+        self._expires_at = now + expires_in
+        # Renew ahead of expiry, but never more often than every half lifetime
+        self._refresh_at = now + max(expires_in - self.refresh_margin, expires_in / 2)
+        self.token_fetches += 1
+
+    def _usable(self, rejected: str | None) -> bool:
+        return self._token is not None and self._token != rejected and time.monotonic() < self._expires_at
+
+    async def _access_token(self, rejected: str | None = None) -> str:
+        """The shared token; fetched now only if there is none, it expired or the API just ``rejected`` it."""
+        if self._usable(rejected):
+            return self._token
+        async with self._token_lock:
+            if not self._usable(rejected):
+                await self._fetch_token()
+            return self._token
+
+    async def _refresh_loop(self):
+        failures = 0
+        while True:
+            delay = self._refresh_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                async with self._token_lock:
+                    if time.monotonic() >= self._refresh_at:
+                        await self._fetch_token()
+                failures = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError, SpotifyError, KeyError, ValueError) as e:
+                failures += 1
+                logger.warning(f"Spotify token renewal failed ({failures} in a row): {e}")
+                await asyncio.sleep(min(300.0, 5.0 * 2 ** (failures - 1)))
+
+    async def _get(self, path: str, **params) -> dict:
+        params = {key: value for key, value in params.items() if value is not None}
+        token = await self._access_token()
+        renewed = False
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                async with self._http().get(f"{API_URL}/{path}", params=params,
+                                            headers={"Authorization": f"Bearer {token}"}) as resp:
+                    if resp.status == 200:
+                        return await resp.json(content_type=None)
+                    status = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+                    try:
+                        message = ((await resp.json(content_type=None)) or {}).get("error", {}).get("message")
+                    except (aiohttp.ContentTypeError, ValueError, AttributeError):
+                        message = None
+                    message = message or resp.reason or "request failed"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if status == 401 and not renewed:
+                    renewed = True
+                    token = await self._access_token(rejected=token)
+                    continue
+                if status not in _RETRIED_STATUSES or attempt >= self.retries:
+                    try:
+                        retry_after = float(retry_after) if retry_after is not None else None
+                    except ValueError:
+                        retry_after = None
+                    raise SpotifyError(status, message, retry_after)
+            await asyncio.sleep(0.5 * 2 ** attempt)
+            attempt += 1
+
+    async def playlist_items(self, playlist_id: str, market: str | None = None, limit: int = 100, offset: int = 0,
+                             fields: str | None = None) -> dict:
+        return await self._get(f"playlists/{spotify_id(playlist_id)}/tracks", market=market, limit=limit,
+                               offset=offset, fields=fields)
+
+    async def album_tracks(self, album_id: str, market: str | None = None, limit: int = 50, offset: int = 0) -> dict:
+        return await self._get(f"albums/{spotify_id(album_id)}/tracks", market=market, limit=limit, offset=offset)
+
+    async def track(self, track_id: str, market: str | None = None) -> dict:
+        return await self._get(f"tracks/{spotify_id(track_id)}", market=market)
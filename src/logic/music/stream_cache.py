@@ -0,0 +1,100 @@
+import re
+import sys
+import time
+from collections import OrderedDict
+
+_EXPIRE_RE = re.compile(r'(?:[?&]expire=|/expire/)(\d+)')
+
+
+def parse_stream_expiry(url: str) -> float | None:
+    """Read the unix expiry timestamp googlevideo embeds in stream URLs."""
+    match = _EXPIRE_RE.search(url or "")
+    return float(match.group(1)) if match else None
+
+
+class StreamCache:
+    """LRU cache of resolved stream URLs keyed by video id.
+
+    Each entry lives until the ``expire=`` timestamp of its URL (minus a
+    safety margin), or ``default_ttl`` seconds when the URL carries none.
+    The cache is bounded both by entry count and by an approximate memory cap.
+    The audio codec and duration of the stream are kept alongside when known.
+    """
+
+    def __init__(self, max_entries: int = 2000, max_bytes: int = 8 * 1024 * 1024,
+                 default_ttl: int = 60 * 60, safety_margin: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.safety_margin = safety_margin
+        self._entries: OrderedDict[str, tuple[str, float, int, str | None, float | None]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(video_id: str, url: str) -> int:
+        return sys.getsizeof(video_id) + sys.getsizeof(url) + 64
+
+    def get(self, video_id: str) -> str | None:
+        entry = self._entries.get(video_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        url, expires_at, _, _, _ = entry
+        if expires_at <= time.time():
+            self.invalidate(video_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(video_id)
+        self.hits += 1
+        return url
+
+    def put(self, video_id: str, url: str, codec: str | None = None, duration: float | None = None):
+        if not video_id or not url:
+            return
+        expiry = parse_stream_expiry(url)
+        if expiry is None:
+            expiry = time.time() + self.default_ttl
+        expires_at = expiry - self.safety_margin
+        if expires_at <= time.time():
+            return
+        self.invalidate(video_id)
+        size = self._entry_size(video_id, url)
+        self._entries[video_id] = (url, expires_at, size, codec, duration)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, old_size, _, _) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+
+    def invalidate(self, video_id: str):
+        entry = self._entries.pop(video_id, None)
+        if entry:
+            self._bytes -= entry[2]
+
+    def codec(self, video_id: str) -> str | None:
+        entry = self._entries.get(video_id)
+        return entry[3] if entry else None
+
+    def duration(self, video_id: str) -> float | None:
+        entry = self._entries.get(video_id)
+        return entry[4] if entry else None
+
+    def expires_in(self, video_id: str) -> float | None:
+        """Seconds until the cached URL for ``video_id`` expires, or None if not cached."""
+        entry = self._entries.get(video_id)
+        return entry[1] - time.time() if entry else None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
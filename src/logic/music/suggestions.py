@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+import mysql.connector
+
+from database import DatabaseManager
+from logic.music.query_store import normalize_query
+from settings import get_logger
+
+logger = get_logger()
+
+
+def get_suggestion_rows(limit: int):
+    """(VIDEO_ID, TITLE, QUERY_KEY, HITS, LAST_USED, PLAY_COUNT, LAST_PLAYED) of the most used query mappings,
+    and of the most played tracks no query maps to (e.g. from playlists), with no query."""
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT * FROM (
+                SELECT q.VIDEO_ID, q.TITLE, q.QUERY_KEY, q.HITS,
+                    UNIX_TIMESTAMP(COALESCE(q.LAST_HIT_AT, q.RESOLVED_AT)) AS LAST_USED,
+                    a.PLAY_COUNT, UNIX_TIMESTAMP(a.LAST_PLAYED_AT) AS LAST_PLAYED
+                FROM MUSIC_QUERY_CACHE q LEFT JOIN MUSIC_AUDIO_CACHE a ON a.VIDEO_ID = q.VIDEO_ID
+                WHERE q.TITLE IS NOT NULL
+                UNION ALL
+                SELECT a.VIDEO_ID, a.TITLE, NULL, 0, NULL, a.PLAY_COUNT, UNIX_TIMESTAMP(a.LAST_PLAYED_AT)
+                FROM MUSIC_AUDIO_CACHE a
+                WHERE a.TITLE IS NOT NULL
+                    AND NOT EXISTS (SELECT 1 FROM MUSIC_QUERY_CACHE q WHERE q.VIDEO_ID = a.VIDEO_ID)
+            ) known
+            ORDER BY COALESCE(PLAY_COUNT, 0) + HITS DESC
+            LIMIT %s
+            """,
+            (limit,))
+        return cursor.fetchall()
+
+
+class SuggestionIndex:
+    """In-memory index of known tracks for the /play autocomplete.
+
+    Seeded from the query mappings and the played tracks (with the play counts
+    of the audio cache) and kept current from the bot's own searches and plays,
+    so a keystroke is answered from memory without any network or database call.
+    Every word of the input must prefix a word of the title or of a query that
+    led to the track; matches rank by uses, decayed by how long ago the track
+    was last used.
+    """
+
+    def __init__(self, max_entries: int = 5000, half_life_days: float = 14.0):
+        self.max_entries = max_entries
+        self.half_life = half_life_days * 86400
+        # video id -> {'title', 'words', 'uses', 'last_used'}, least recently used first
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Seed the index from the database; blocking, run it in an executor."""
+        try:
+            rows = get_suggestion_rows(self.max_entries)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Could not load the music suggestions: {e}')
+            return
+        for video_id, title, query_key, hits, last_hit, plays, last_played in reversed(rows):
+            self._add(video_id, title, query_key, (hits or 0) + (plays or 0),
+                      max(float(last_hit or 0), float(last_played or 0)))
+
+    def _add(self, video_id: str, title: str | None, query: str | None, uses: int, last_used: float):
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                if not title:
+                    return
+                entry = self._entries[video_id] = {'title': title, 'words': set(), 'uses': 0, 'last_used': 0.0}
+            entry['words'].update(normalize_query(title or entry['title']).split())
+            if query:
+                entry['words'].update(normalize_query(query).split())
+            entry['uses'] += uses
+            entry['last_used'] = max(entry['last_used'], last_used)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, video_id: str, title: str | None, query: str | None = None):
+        """A track was searched for or played."""
+        if video_id:
+            self._add(video_id, title, query, 1, time.time())
+
+    def score(self, entry: dict, now: float) -> float:
+        return entry['uses'] * 0.5 ** (max(0.0, now - entry['last_used']) / self.half_life)
+
+    def search(self, text: str, limit: int = 25, extra: dict[str, str] | None = None) -> list[tuple[str, str]]:
+        """Best (video id, title) matches for a partial input; ``extra`` adds unranked candidates
+        ({video id: title}, e.g. the session's queue) that rank below every indexed track."""
+        words = normalize_query(text).split()
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.items())
+        ranked = []
+        for video_id, entry in entries:
+            if all(any(word.startswith(w) for word in entry['words']) for w in words):
+                ranked.append((self.score(entry, now), video_id, entry['title']))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        found = [(video_id, title) for _, video_id, title in ranked[:limit]]
+        seen = {video_id for video_id, _ in found}
+        for video_id, title in (extra or {}).items():
+            if len(found) >= limit:
+                break
+            if video_id in seen or not title:
+                continue
+            title_words = normalize_query(title).split()
+            if all(any(word.startswith(w) for word in title_words) for w in words):
+                found.append((video_id, title))
+                seen.add(video_id)
+        return found
@@ -0,0 +1,127 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# The trace of the command or track transition the running task works for
+current: contextvars.ContextVar['Trace | None'] = contextvars.ContextVar('music_trace', default=None)
+
+
+class Trace:
+    """Named spans of one /play or track transition, from the command to the first audio packet.
+
+    Spans with the same name add up (e.g. two extractions). Spans recorded after
+    ``finish`` (late background work that inherited the context) are ignored.
+    """
+
+    def __init__(self, kind: str, guild_id: int, on_finish=None):
+        self.kind = kind
+        self.guild_id = guild_id
+        self.on_finish = on_finish
+        self.started = time.monotonic()
+        self.spans: dict[str, float] = {}
+        self.total: float | None = None
+        self.outcome: str | None = None
+        self.handed_off = False  # playback was started and will finish the trace at its first packet
+
+    @property
+    def finished(self) -> bool:
+        return self.total is not None
+
+    def add(self, name: str, seconds: float):
+        if not self.finished:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def finish(self, outcome: str = 'ok'):
+        if self.finished:
+            return
+        self.total = time.monotonic() - self.started
+        self.outcome = outcome
+        if self.on_finish:
+            self.on_finish(self)
+
+    def describe(self) -> str:
+        spans = ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in self.spans.items())
+        return f'{self.kind} {self.total * 1000:.0f}ms [{self.outcome}]' + (f': {spans}' if spans else '')
+
+
+def begin(kind: str, guild_id: int, on_finish=None) -> Trace:
+    """Start a trace and make it the current one of the running task (and the tasks it creates)."""
+    trace = Trace(kind, guild_id, on_finish)
+    current.set(trace)
+    return trace
+
+
+def detach():
+    """Stop recording into the inherited trace; for background work spawned by a traced command."""
+    current.set(None)
+
+
+def add(name: str, seconds: float):
+    trace = current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    trace = current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted samples; 0.0 when there are none."""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+
+class TraceStats:
+    """Rolling percentiles of the last ``window`` traces, per trace kind and per span.
+
+    Only traces that reached audio are sampled; the others are just counted by outcome.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.counts: dict[tuple[str, str], int] = {}  # (kind, outcome) -> traces
+        self._samples: dict[tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace):
+        with self._lock:
+            key = (trace.kind, trace.outcome)
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if trace.outcome != 'ok':
+                return
+            for name, seconds in (('total', trace.total), *trace.spans.items()):
+                samples = self._samples.get((trace.kind, name))
+                if samples is None:
+                    samples = self._samples[(trace.kind, name)] = deque(maxlen=self.window)
+                samples.append(seconds)
+
+    def percentiles(self) -> dict[str, dict[str, dict]]:
+        """{kind: {span: {count, p50, p90, p99}}} in seconds, 'total' first."""
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items()}
+        result: dict[str, dict[str, dict]] = {}
+        for (kind, name), ordered in sorted(snapshot.items(), key=lambda item: (item[0][0], item[0][1] != 'total')):
+            result.setdefault(kind, {})[name] = {
+                'count': len(ordered),
+                'p50': percentile(ordered, 50),
+                'p90': percentile(ordered, 90),
+                'p99': percentile(ordered, 99),
+            }
+        return result
@@ -0,0 +1,52 @@
+import sys
+
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def thumbnail_url(video_id: str) -> str:
+    # safe default if yt-dlp entry lacks thumbnails
+    return f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"
+
+
+class Track:
+    """A queued song, kept small because playlist imports queue thousands of them.
+
+    Only the video id, the (interned) title and, once resolved, the stream URL
+    are stored. The watch link and the thumbnail are derived from the video id;
+    they are only stored when they differ from that, e.g. a playlist entry
+    without an id or the better thumbnail of a fully extracted video.
+    """
+
+    __slots__ = ('video_id', 'title', 'source', '_url', '_thumbnail')
+
+    def __init__(self, video_id: str | None, title: str | None, source: str | None = None,
+                 url: str | None = None, thumbnail: str | None = None):
+        self.video_id = video_id
+        self.title = sys.intern(title) if title else title
+        self.source = source
+        self._url = url if url and (not video_id or url != watch_url(video_id)) else None
+        self._thumbnail = thumbnail if thumbnail and (not video_id or thumbnail != thumbnail_url(video_id)) else None
+
+    @property
+    def link(self) -> str | None:
+        return self._url or (watch_url(self.video_id) if self.video_id else None)
+
+    # Kept as a separate name: it is the URL playback and the caches resolve
+    original_url = link
+
+    @property
+    def thumbnail(self) -> str | None:
+        return self._thumbnail or (thumbnail_url(self.video_id) if self.video_id else None)
+
+    def fields(self) -> tuple:
+        """(video id, title, url, thumbnail) as stored, to persist the track without its source.
+
+        ``url`` and ``thumbnail`` are None unless they differ from the ones derived from the video id;
+        rebuild with ``Track(video_id, title, url=url, thumbnail=thumbnail)``.
+        """
+        return self.video_id, self.title, self._url, self._thumbnail
+
+    def __repr__(self):
+        return f'Track({self.video_id!r}, {self.title!r})'
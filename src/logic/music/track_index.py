@@ -0,0 +1,109 @@
+import mysql.connector
+
+from database import DatabaseManager
+from settings import get_logger
+
+logger = get_logger()
+
+
+def get_track_identities(spotify_ids: list[str], isrcs: list[str]):
+    """Rows (SPOTIFY_ID, ISRC, VIDEO_ID) matching any of the given Spotify ids or ISRCs."""
+    conditions, params = [], []
+    if spotify_ids:
+        conditions.append(f"SPOTIFY_ID IN ({', '.join(['%s'] * len(spotify_ids))})")
+        params += spotify_ids
+    if isrcs:
+        conditions.append(f"ISRC IN ({', '.join(['%s'] * len(isrcs))})")
+        params += isrcs
+    if not conditions:
+        return []
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT SPOTIFY_ID, ISRC, VIDEO_ID FROM MUSIC_TRACK_IDENTITY WHERE {' OR '.join(conditions)}",
+            tuple(params))
+        return cursor.fetchall()
+
+
+def record_identity_hits(spotify_ids: list[str]) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            UPDATE MUSIC_TRACK_IDENTITY SET HITS = HITS + 1, LAST_HIT_AT = NOW()
+            WHERE SPOTIFY_ID IN ({', '.join(['%s'] * len(spotify_ids))})
+            """, tuple(spotify_ids))
+        conn.commit()
+
+
+def save_track_identity(spotify_id: str, isrc: str | None, video_id: str, duration_diff: int | None) -> None:
+    with DatabaseManager().get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO MUSIC_TRACK_IDENTITY (SPOTIFY_ID, ISRC, VIDEO_ID, DURATION_DIFF, MATCHED_AT)
+            VALUES (%s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE ISRC = VALUES(ISRC), VIDEO_ID = VALUES(VIDEO_ID),
+                DURATION_DIFF = VALUES(DURATION_DIFF), MATCHED_AT = NOW()
+            """,
+            (spotify_id, isrc, video_id, duration_diff))
+        conn.commit()
+
+
+class TrackIndex:
+    """Persistent Spotify track -> YouTube video index.
+
+    Tracks are found by Spotify id, or by ISRC so the same recording on another
+    album or playlist entry also skips the YouTube search. Lookups are batched
+    per Spotify page. Methods are blocking; run them in an executor.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def lookup_many(self, tracks: list[dict]) -> dict[str, str]:
+        """Return {spotify id: video id} for the tracks already in the index."""
+        spotify_ids = [t["spotify_id"] for t in tracks if t.get("spotify_id")]
+        isrcs = [t["isrc"] for t in tracks if t.get("isrc")]
+        try:
+            rows = get_track_identities(spotify_ids, isrcs)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Track index lookup failed: {e}')
+            return {}
+        by_id = {spotify_id: video_id for spotify_id, _, video_id in rows}
+        by_isrc = {isrc: video_id for _, isrc, video_id in rows if isrc}
+        found = {}
+        for t in tracks:
+            video_id = by_id.get(t.get("spotify_id")) or by_isrc.get(t.get("isrc"))
+            if video_id and t.get("spotify_id"):
+                found[t["spotify_id"]] = video_id
+        self.hits += len(found)
+        self.misses += len(tracks) - len(found)
+        direct = [spotify_id for spotify_id in found if spotify_id in by_id]
+        if direct:
+            try:
+                record_identity_hits(direct)
+            except (mysql.connector.Error, ValueError) as e:
+                logger.warning(f'Track index hit update failed: {e}')
+        for t in tracks:
+            # Matched through the ISRC only: index this Spotify id too
+            if t.get("spotify_id") in found and t["spotify_id"] not in by_id:
+                self.store(t, found[t["spotify_id"]])
+        return found
+
+    def store(self, track: dict, video_id: str, duration_diff: int | None = None):
+        if not track.get("spotify_id") or not video_id:
+            return
+        try:
+            save_track_identity(track["spotify_id"], track.get("isrc"), video_id, duration_diff)
+        except (mysql.connector.Error, ValueError) as e:
+            logger.warning(f'Track index store failed: {e}')
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,200 @@
+import random
+from collections import deque
+from itertools import islice
+
+from logic.music.track import Track
+
+
+class TrackQueue:
+    """Play queue of a guild session.
+
+    Every entry is a dict ``{'id', 'song', 'order'}`` holding a ``Track``. Ids are handed
+    out in increasing order and never reused, so commands can refer to a track
+    by id while playlist fetches keep appending. Upcoming ids live in a deque
+    (O(1) append and advance), played ones in a history ring of ``history_size``.
+
+    ``order`` is the entry's position in the unshuffled queue: shuffling only
+    permutes the upcoming deque and unshuffling sorts it back by that key. Until
+    a ``move`` re-keys an entry, the order keys grow with the ids, so
+    unshuffling sorts the ids themselves.
+    ``version`` changes on every mutation, so a saved copy knows when it is stale.
+
+    Appending costs more than appending to a plain list (each entry gets an id
+    and an order key); ``skip_to`` and ``move`` are linear in the distance or
+    queue length, but run in C over the id deque.
+    """
+
+    def __init__(self, history_size: int = 20):
+        self.history_size = history_size
+        self._entries: dict[int, dict] = {}
+        self._history: deque[int] = deque()
+        self._current: int | None = None
+        self._upcoming: deque[int] = deque()
+        self._next_id = 0
+        self._next_order = 0.0
+        self.shuffled = False
+        self._rekeyed = False  # some order key no longer follows the entry ids
+        self.version = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, entry_id: int):
+        return entry_id in self._entries
+
+    def get(self, entry_id: int) -> dict | None:
+        return self._entries.get(entry_id)
+
+    @property
+    def current(self) -> dict | None:
+        return self._entries[self._current] if self._current is not None else None
+
+    @property
+    def previous(self) -> dict | None:
+        return self._entries[self._history[-1]] if self._history else None
+
+    def last(self) -> dict | None:
+        """Most recently appended entry still in the queue."""
+        return self._entries[next(reversed(self._entries))] if self._entries else None
+
+    def append(self, song: Track) -> dict:
+        entry = {'id': self._next_id, 'song': song, 'order': self._next_order}
+        self._entries[entry['id']] = entry
+        self._upcoming.append(entry['id'])
+        self._next_id += 1
+        self._next_order += 1
+        self.version += 1
+        return entry
+
+    def has_next(self) -> bool:
+        return bool(self._upcoming)
+
+    def upcoming_count(self) -> int:
+        return len(self._upcoming)
+
+    def upcoming(self, count: int | None = None, start: int = 0) -> list[dict]:
+        stop = None if count is None else start + count
+        return [self._entries[entry_id] for entry_id in islice(self._upcoming, start, stop)]
+
+    def _push_history(self, entry_id: int):
+        if len(self._history) >= self.history_size:
+            del self._entries[self._history.popleft()]
+        self._history.append(entry_id)
+
+    def advance(self) -> dict | None:
+        """Move to the next entry; the current one goes to history. Returns the new current entry."""
+        if self._current is not None:
+            self._push_history(self._current)
+        self._current = self._upcoming.popleft() if self._upcoming else None
+        self.version += 1
+        return self.current
+
+    def back(self) -> dict | None:
+        """Move to the previous entry; the current one becomes the next again."""
+        if self._current is not None:
+            self._upcoming.appendleft(self._current)
+        self._current = self._history.pop() if self._history else None
+        self.version += 1
+        return self.current
+
+    def skip_to(self, entry_id: int) -> bool:
+        """Make ``entry_id`` the next entry, skipping forward or rewinding through history."""
+        if entry_id in self._history:
+            while not self._upcoming or self._upcoming[0] != entry_id:
+                self.back()
+            return True
+        try:
+            position = self._upcoming.index(entry_id)
+        except ValueError:
+            return False
+        if position:
+            skipped = list(islice(self._upcoming, position))
+            self._upcoming = deque(islice(self._upcoming, position, None))
+            self._history.extend(skipped)
+            while len(self._history) > self.history_size:
+                del self._entries[self._history.popleft()]
+        self.version += 1
+        return True
+
+    def move(self, entry_id: int, target_id: int) -> bool:
+        """Move an upcoming entry to the position currently held by ``target_id``."""
+        if entry_id == target_id or entry_id not in self._upcoming or target_id not in self._upcoming:
+            return False
+        position = self._upcoming.index(target_id)
+        self._upcoming.remove(entry_id)
+        self._upcoming.insert(position, entry_id)
+        if not self.shuffled:
+            # Re-key between the new neighbours so unshuffling keeps the move
+            before = self._entries[self._upcoming[position - 1]]['order'] if position > 0 else None
+            after = self._entries[self._upcoming[position + 1]]['order'] \
+                if position + 1 < len(self._upcoming) else None
+            if before is None:
+                order = after - 1 if after is not None else 0.0
+            elif after is None:
+                order = before + 1
+            else:
+                order = (before + after) / 2
+            self._entries[entry_id]['order'] = order
+            self._next_order = max(self._next_order, order + 1)
+            self._rekeyed = True
+        self.version += 1
+        return True
+
+    def shuffle(self):
+        ids = list(self._upcoming)
+        random.shuffle(ids)
+        self._upcoming = deque(ids)
+        self.shuffled = True
+        self.version += 1
+
+    def unshuffle(self):
+        if self._rekeyed:
+            self._upcoming = deque(sorted(self._upcoming, key=lambda entry_id: self._entries[entry_id]['order']))
+        else:
+            self._upcoming = deque(sorted(self._upcoming))
+        self.shuffled = False
+        self.version += 1
+
+    def clear(self):
+        """Drop everything except the current entry."""
+        keep = self.current
+        self._entries = {keep['id']: keep} if keep else {}
+        self._history.clear()
+        self._upcoming.clear()
+        self.version += 1
+
+    def reset(self):
+        self._entries.clear()
+        self._history.clear()
+        self._upcoming.clear()
+        self._current = None
+        self.shuffled = False
+        self._rekeyed = False
+        self.version += 1
+
+    def entries(self):
+        """Every entry still in the queue (history, current and upcoming), oldest first."""
+        return self._entries.values()
+
+    def layout(self) -> tuple[list[int], int | None, list[int]]:
+        """Entry ids of the history, the current entry and the upcoming entries, in play order."""
+        return list(self._history), self._current, list(self._upcoming)
+
+    def restore(self, entries: list[dict], history: list[int], current: int | None, upcoming: list[int],
+                shuffled: bool):
+        """Replace the queue with a saved one; ``entries`` keep their saved ids and order keys."""
+        by_id = {entry['id']: entry for entry in entries}
+        history = [entry_id for entry_id in history if entry_id in by_id][-self.history_size:]
+        current = current if current in by_id else None
+        upcoming = [entry_id for entry_id in upcoming if entry_id in by_id]
+        live = set(history) | set(upcoming) | ({current} if current is not None else set())
+        self._entries = {entry_id: by_id[entry_id] for entry_id in sorted(live)}
+        self._history = deque(history)
+        self._current = current
+        self._upcoming = deque(upcoming)
+        self._next_id = max(live) + 1 if live else 0
+        self._next_order = max((entry['order'] for entry in self._entries.values()), default=-1.0) + 1
+        self.shuffled = shuffled
+        orders = [entry['order'] for entry in self._entries.values()]
+        self._rekeyed = any(a >= b for a, b in zip(orders, orders[1:]))
+        self.version += 1
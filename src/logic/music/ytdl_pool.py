@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from yt_dlp import YoutubeDL
+
+_MISSING = object()
+
+
+class YtdlPool:
+    """Long-lived YoutubeDL instances, kept in one free list per option profile.
+
+    Building a YoutubeDL registers every extractor and resolves its options,
+    which is paid again on each ``YoutubeDL(...)`` call. A checked-out instance
+    belongs to a single executor thread until it is returned. Instances are
+    closed and rebuilt after ``max_uses`` extractions or when an extraction fails.
+    """
+
+    def __init__(self, profiles: dict[str, dict], max_uses: int = 200):
+        self.profiles = profiles
+        self.max_uses = max_uses
+        self._free: dict[str, list[tuple[YoutubeDL, int]]] = {name: [] for name in profiles}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.recycled = 0
+        self.build_seconds = 0.0
+
+    def _build(self, profile: str) -> YoutubeDL:
+        start = time.perf_counter()
+        ydl = YoutubeDL(dict(self.profiles[profile]))
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.created += 1
+            self.build_seconds += elapsed
+        return ydl
+
+    def _acquire(self, profile: str) -> tuple[YoutubeDL, int]:
+        with self._lock:
+            free = self._free[profile]
+            if free:
+                self.reused += 1
+                return free.pop()
+        return self._build(profile), 0
+
+    def _discard(self, ydl: YoutubeDL):
+        with self._lock:
+            self.recycled += 1
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def checkout(self, profile: str, **overrides):
+        """Borrow an instance of ``profile``; ``overrides`` are applied to its params for this use only."""
+        ydl, uses = self._acquire(profile)
+        saved = {key: ydl.params.get(key, _MISSING) for key in overrides}
+        ydl.params.update(overrides)
+        failed = True
+        try:
+            yield ydl
+            failed = False
+        finally:
+            for key, value in saved.items():
+                if value is _MISSING:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+            uses += 1
+            if failed or uses >= self.max_uses:
+                self._discard(ydl)
+            else:
+                with self._lock:
+                    self._free[profile].append((ydl, uses))
+
+    def close(self):
+        with self._lock:
+            instances = [ydl for free in self._free.values() for ydl, _ in free]
+            for free in self._free.values():
+                free.clear()
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        avg_build = self.build_seconds / self.created if self.created else 0.0
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "recycled": self.recycled,
+            "build_seconds": self.build_seconds,
+            "avg_build_seconds": avg_build,
+            "build_seconds_saved": avg_build * self.reused,
+        }
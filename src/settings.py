@@ -70,6 +70,95 @@ ROLES = {'DOURADINHO_GOD': 759023632051339264,
 
 PREMIUM_ROLES = {'ASSETO_PREMIUM': 1233745879945580635}
 
+# MUSIC
+MUSIC_STREAM_CACHE_MAX_ENTRIES = 2000
+MUSIC_STREAM_CACHE_MAX_BYTES = 8 * 1024 * 1024
+# Queued tracks whose stream URL expires within this many seconds are re-resolved ahead of time
+MUSIC_STREAM_REFRESH_MARGIN = 10 * 60
+MUSIC_STREAM_REFRESH_LOOKAHEAD = 5
+# Search results older than this are searched again instead of served from the query cache
+MUSIC_QUERY_CACHE_MAX_AGE_DAYS = 30
+# Pooled YoutubeDL instances are rebuilt after this many extractions
+MUSIC_YTDL_MAX_USES = 200
+# yt-dlp extraction backend: 'thread' (in-process) or 'process' (warm worker processes, POSIX only)
+MUSIC_EXTRACTION_MODE = os.getenv("MUSIC_EXTRACTION_MODE", "thread")
+MUSIC_EXTRACTION_WORKERS = 3
+MUSIC_EXTRACTION_CONCURRENCY = 6
+MUSIC_EXTRACTION_TIMEOUT = 60
+# Background extractions (prefetch, playlist and Spotify imports) running at once; kept below the worker
+# count so a /play or track start always finds a free worker
+MUSIC_EXTRACTION_BACKGROUND_CONCURRENCY = 2
+# Requests to YouTube per second (bursts up to BURST), of which background work leaves RESERVE for users;
+# a bot-check or 429 pauses requests for COOLDOWN seconds, doubled on each trip in a row up to MAX_COOLDOWN
+MUSIC_YOUTUBE_RATE = 5.0
+MUSIC_YOUTUBE_BURST = 10
+MUSIC_YOUTUBE_FOREGROUND_RESERVE = 3
+MUSIC_YOUTUBE_COOLDOWN = 60
+MUSIC_YOUTUBE_MAX_COOLDOWN = 60 * 60
+# Upcoming tracks kept resolved; the window grows towards the max as users skip more
+MUSIC_PREFETCH_MIN = 1
+MUSIC_PREFETCH_MAX = 5
+MUSIC_PREFETCH_CONCURRENCY = 2
+# Tracks played this many times are downloaded and served from disk (LRU within the size budget)
+MUSIC_AUDIO_CACHE_PATH = os.getenv("MUSIC_AUDIO_CACHE_PATH", os.path.join('cache', 'audio'))
+MUSIC_AUDIO_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+MUSIC_AUDIO_CACHE_MIN_PLAYS = 3
+MUSIC_AUDIO_CACHE_DOWNLOAD_TIMEOUT = 10 * 60
+# Downloads run on their own threads, outside the extraction slots
+MUSIC_AUDIO_CACHE_DOWNLOAD_CONCURRENCY = 1
+# 'opus' hands Opus streams to Discord without re-encoding; 'pcm' decodes and scales volume in the bot
+MUSIC_PLAYBACK_MODE = os.getenv("MUSIC_PLAYBACK_MODE", "opus")
+MUSIC_VOLUME = 0.5  # pcm mode only
+# Opus mode plays streams at their own level (0 dB), about 6 dB (twice) as loud as pcm mode at
+# MUSIC_VOLUME = 0.5; listeners turn the bot down with Discord's per-user volume. A non-zero gain is
+# applied by an ffmpeg filter, which re-encodes every stream and gives up the copy path, so it stays 0
+MUSIC_OPUS_GAIN_DB = 0.0
+# Played tracks kept for 'previous' and skip_to
+MUSIC_QUEUE_HISTORY = 20
+# YouTube playlists are listed in pages after their first entry, and queued up to a maximum number of entries
+MUSIC_PLAYLIST_PAGE_SIZE = 100
+MUSIC_PLAYLIST_MAX_ENTRIES = 3000
+# Spotify tracks searched on YouTube at once, and how far mapping may run ahead of the queue
+MUSIC_SPOTIFY_MAPPING_WORKERS = 6
+MUSIC_SPOTIFY_MAPPING_WINDOW = 50
+# Spotify pages fetched at once, and retries of a call answered with 429
+MUSIC_SPOTIFY_PAGE_CONCURRENCY = 4
+MUSIC_SPOTIFY_MAX_RETRIES = 5
+# Pooled connections to the Spotify API, and how long before expiry (seconds) its access token is renewed
+MUSIC_SPOTIFY_CONNECTIONS = 8
+MUSIC_SPOTIFY_TOKEN_REFRESH_MARGIN = 300
+# Spotify tracks missing from the identity index: YouTube results considered, and the
+# duration difference (seconds) within which a result counts as the same recording
+MUSIC_MATCH_CANDIDATES = 5
+MUSIC_MATCH_DURATION_TOLERANCE = 5
+# Now-playing message edits are coalesced to at most one per interval (seconds)
+MUSIC_CONTROLLER_INTERVAL = 1.0
+# Time-to-first-audio percentiles are taken over the last N traces
+MUSIC_TRACE_WINDOW = 200
+# The next track's audio is opened this many seconds before the current one ends...
+MUSIC_PREROLL_SECONDS = 8
+# ...and this many seconds of it are read ahead, so the switch does not wait on the network
+MUSIC_PREROLL_BUFFER_SECONDS = 3
+# Per-track gain from a one-off loudness analysis: target loudness (LUFS), peak ceiling (dBTP) and max boost (dB)
+MUSIC_LOUDNESS_TARGET = -16.0
+MUSIC_LOUDNESS_MAX_PEAK = -1.0
+MUSIC_LOUDNESS_MAX_BOOST = 12.0
+# In opus mode a gain means re-encoding the stream (ffmpeg decodes and encodes every frame instead of
+# copying packets), so there only corrections of at least this many dB are applied: the quiet uploads
+# and the ones mastered far above the target, while typical tracks keep the copy path
+MUSIC_LOUDNESS_MIN_ADJUST_DB = 4.0
+MUSIC_LOUDNESS_CONCURRENCY = 1
+MUSIC_LOUDNESS_TIMEOUT = 180
+# Live sessions (queue, shuffle order, position) are saved this often (seconds) and resumed after a restart
+MUSIC_CHECKPOINT_INTERVAL = 15
+# Sessions whose last checkpoint is older than this (seconds) are not resumed
+MUSIC_RESUME_MAX_AGE = 30 * 60
+# /play autocomplete: tracks kept in the in-memory index, how fast their ranking decays (days), and how
+# many of the session's latest queue entries are offered as well
+MUSIC_SUGGESTIONS_MAX_ENTRIES = 5000
+MUSIC_SUGGESTIONS_HALF_LIFE_DAYS = 14
+MUSIC_SUGGESTIONS_QUEUE_ENTRIES = 50
+
 IMDB_API = os.getenv("CLOUDFLARE_WORKER")
 api_key = os.getenv("CURRENCY_API_KEY")
 CURRENCY_API = f'https://api.freecurrencyapi.com/v1/latest?apikey={api_key}'